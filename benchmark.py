@@ -0,0 +1,158 @@
+import argparse
+import glob
+import json
+import os
+import platform
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import localSearch as ls
+from classes import Instance
+from instrumentation import Tracer
+
+# Relative change above which a metric is reported as a regression
+defaultTolerance = 0.1
+
+
+def benchmarkRun(instancePath, seed, timeLimit, traceDir=None):
+    # One solver run, executed in its own process so that the peak memory is its own
+    # With traceDir, the search events are written to <instance>_<seed>_trace.jsonl in traceDir
+    ls.verbose = False
+    name = os.path.splitext(os.path.basename(instancePath))[0]
+
+    start = time.perf_counter()
+    Instance(instancePath, use_cache=False)
+    loadTime = time.perf_counter() - start
+    # The first cache read of a process also pays for NumPy's lazy imports
+    Instance(instancePath)
+    start = time.perf_counter()
+    instance = Instance(instancePath)
+    loadTimeCached = time.perf_counter() - start
+
+    tracePath = None if traceDir is None else os.path.join(traceDir, f"{name}_{seed}_trace.jsonl")
+    tracer = Tracer(tracePath)
+    start = time.perf_counter()
+    sol = ls.mainLSinst(instance, timeLimit=timeLimit, seed=seed, tracer=tracer)
+    elapsed = time.perf_counter() - start
+    tracer.close()
+
+    return {
+        "instance": name,
+        "seed": seed,
+        "time_budget": timeLimit,
+        "load_time": loadTime,
+        "load_time_cached": loadTimeCached,
+        "elapsed": elapsed,
+        "iterations": sum(tracer.calls.values()),
+        "best_cost": sol.evaluate(),
+        "peak_memory_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "neighborhoods": tracer.neighborhoodStats(),
+        "counters": tracer.counters,
+        "history": tracer.history,
+        "summary": tracer.summary(),
+    }
+
+
+def runBenchmark(instancePaths, seeds, timeLimit, traceDir=None):
+    runs = []
+    # Runs are sequential, each in a fresh process, to keep timings comparable
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn"), max_tasks_per_child=1) as pool:
+        for instancePath in instancePaths:
+            for seed in seeds:
+                run = pool.submit(benchmarkRun, instancePath, seed, timeLimit, traceDir).result()
+                print(
+                    f"{run['instance']:>8} seed {seed}: cost {run['best_cost']:.2f}, "
+                    f"{run['iterations']} iterations in {run['elapsed']:.2f}s, "
+                    f"load {run['load_time'] * 1000:.1f}ms ({run['load_time_cached'] * 1000:.1f}ms cached), "
+                    f"peak {run['peak_memory_kb'] / 1024:.0f}MB"
+                )
+                # The neighborhood table is printed, the results keep the raw statistics
+                print(run.pop("summary"))
+                runs.append(run)
+
+    return {
+        "meta": {
+            "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "time_budget": timeLimit,
+            "seeds": list(seeds),
+        },
+        "runs": runs,
+    }
+
+
+def timeToCost(history, cost):
+    # First time at which the run reached cost, None if it never did
+    for elapsed, reached in history:
+        if reached <= cost:
+            return elapsed
+    return None
+
+
+def compareResults(old, new, tolerance=defaultTolerance):
+    # Regressions of new against old, as printable lines
+    regressions = []
+    oldRuns = {(run["instance"], run["seed"]): run for run in old["runs"]}
+    for run in new["runs"]:
+        key = (run["instance"], run["seed"])
+        if key not in oldRuns:
+            continue
+        ref = oldRuns[key]
+        label = f"{run['instance']} seed {run['seed']}"
+
+        def check(metric, oldValue, newValue, higherIsBetter):
+            if oldValue is None or newValue is None or oldValue == 0:
+                return
+            change = (newValue - oldValue) / abs(oldValue)
+            worse = -change if higherIsBetter else change
+            line = f"{label:>20} {metric:<28} {oldValue:>14.4g} -> {newValue:<14.4g} ({change:+.1%})"
+            print(line + ("  <-- regression" if worse > tolerance else ""))
+            if worse > tolerance:
+                regressions.append(line)
+
+        check("best cost", ref["best_cost"], run["best_cost"], False)
+        check("time to reference cost", timeToCost(ref["history"], ref["best_cost"]), timeToCost(run["history"], ref["best_cost"]), False)
+        check("load time", ref["load_time"], run["load_time"], False)
+        check("peak memory", ref["peak_memory_kb"], run["peak_memory_kb"], False)
+        for voisType, stats in run["neighborhoods"].items():
+            if voisType in ref["neighborhoods"]:
+                check(f"neighborhood {voisType} iterations/s", ref["neighborhoods"][voisType]["iterations_per_sec"], stats["iterations_per_sec"], True)
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the local search on the instances")
+    # Smallest instances first
+    parser.add_argument("instances", nargs="*", default=sorted(glob.glob("./instances/*.json"), key=os.path.getsize))
+    parser.add_argument("--seeds", type=int, nargs="+", default=[0])
+    parser.add_argument("--time", type=float, default=10.0, help="time budget per run, in seconds")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two results files")
+    parser.add_argument("--tolerance", type=float, default=defaultTolerance)
+    parser.add_argument("--trace", metavar="PATH", help="directory receiving a JSONL trace of the search events of each run")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as f:
+            old = json.load(f)
+        with open(args.compare[1]) as f:
+            new = json.load(f)
+        regressions = compareResults(old, new, args.tolerance)
+        print(f"{len(regressions)} regression(s)")
+        sys.exit(1 if regressions else 0)
+
+    if args.trace is not None:
+        os.makedirs(args.trace, exist_ok=True)
+    results = runBenchmark(args.instances, args.seeds, args.time, args.trace)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=1)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import json
+import os
+import time
+import weakref
+
+import numpy as np
+from logzero import logger
+from scipy.optimize import linprog
+from scipy.sparse import coo_array
+
+from classes import replace_file
+
+# Scenario buckets of the relaxation, by increasing power
+nbBuckets = 10
+
+# instance -> {largest number of open stations: bound}, also kept on disk next to the instance file
+_bounds = weakref.WeakKeyDictionary()
+
+
+def ratingLevels(instance, station):
+    # Distinct ratings of the (substation type, land cable) configurations of a station, with the cheapest
+    # construction cost of a configuration of at least that rating
+    rating = np.minimum(instance.substation_rating[:, None], instance.land_cable_rating[None, :]).ravel()
+    cost = (instance.substation_cost[:, None] + instance.land_cable_cost[station][None, :]).ravel()
+    levels = np.unique(rating)
+    cheapest = np.array([cost[rating >= level].min() for level in levels])
+    return levels, cheapest
+
+
+def scenarioBuckets(instance, nbBuckets):
+    # Probability and mean power of groups of scenarios of close power
+    groups = np.array_split(instance.scenario_order, min(nbBuckets, len(instance.scenario_order)))
+    probability = np.array([instance.scenario_probability[g].sum() for g in groups])
+    power = np.array([instance.scenario_probability[g] @ instance.scenario_power[g] for g in groups]) / np.maximum(probability, 1e-300)
+    return probability, power
+
+
+def maxFailure(instance, upperBound):
+    # Largest total failure probability of the open stations of a solution costing less than upperBound
+    nbStations = instance.get_nb_stations()
+    openCost = instance.substation_cost.min() + instance.land_cable_cost.min()
+    maxOpen = nbStations if upperBound is None or openCost <= 0 else min(nbStations, int(upperBound // openCost))
+    return maxOpen, min(1.0, maxOpen * (instance.substation_failure.max() + instance.land_cable_failure.max()))
+
+
+def _cachePath(instance):
+    # File of the bounds of an instance read from a file, with the key telling whether they still hold
+    if instance.filepath is None:
+        return None, None
+    stat = os.stat(instance.filepath)
+    return os.path.splitext(instance.filepath)[0] + ".bound.json", [nbBuckets, stat.st_size, stat.st_mtime_ns]
+
+
+def _loadBounds(instance):
+    path, key = _cachePath(instance)
+    if path is None or not os.path.exists(path):
+        return {}
+    try:
+        with open(path) as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return {int(maxOpen): bound for maxOpen, bound in cache["bounds"].items()} if cache.get("key") == key else {}
+
+
+def _saveBounds(instance, bounds):
+    path, key = _cachePath(instance)
+    if path is None:
+        return
+    try:
+        replace_file(path, lambda f: json.dump({"key": key, "bounds": bounds}, f), "w")
+    except OSError as e:
+        logger.warning(f"Could not write bound cache {path}: {e}")
+
+
+def lowerBound(instance, upperBound=None, deadline=None):
+    # Lower bound on the cost of the solutions cheaper than upperBound, from a linear relaxation solved by HiGHS,
+    # None when it is not solved before the deadline.
+    # Stations are opened at a fraction of a rating level, turbines split among them; the curtailment is
+    # bounded per bucket of scenarios by Jensen's inequality, and the failure scenarios only by their
+    # probability: with no failure, of probability at least 1 - the largest total failure, the cost is at
+    # least the one of the no-failure curtailment. Substation cables cost and only act in failures, they are left out.
+    maxOpen, failure = maxFailure(instance, upperBound)
+    if instance not in _bounds:
+        _bounds[instance] = _loadBounds(instance)
+    bounds = _bounds[instance]
+    if maxOpen not in bounds:
+        timeLimit = None if deadline is None else deadline - time.perf_counter()
+        if timeLimit is not None and timeLimit <= 0:
+            return None
+        bound = _solveRelaxation(instance, 1 - failure, timeLimit)
+        if bound is None:
+            return None
+        bounds[maxOpen] = bound
+        _saveBounds(instance, bounds)
+    return bounds[maxOpen]
+
+
+def _solveRelaxation(instance, noFailure, timeLimit=None):
+    # Optimal value of the relaxation, None when HiGHS stops at timeLimit seconds
+    nbTurbines, nbStations = instance.get_nb_turbines(), instance.get_nb_stations()
+    probability, power = scenarioBuckets(instance, nbBuckets)
+    B = len(probability)
+
+    # Variables: y[s, level] rating level opened at s, z[t, s] turbine assignment, n[s] turbines of s,
+    # c[s, b] curtailment of s in bucket b, q[b] curtailment of bucket b above maximum_curtailing
+    levels = [ratingLevels(instance, s) for s in range(nbStations)]
+    yStart = np.cumsum([0] + [len(l) for l, _ in levels])
+    zStart = yStart[-1]
+    nStart = zStart + nbTurbines * nbStations
+    cStart = nStart + nbStations
+    qStart = cStart + nbStations * B
+    nbVars = qStart + B
+    yStation = np.repeat(np.arange(nbStations), np.diff(yStart))
+    yRating = np.concatenate([l for l, _ in levels])
+
+    cost = np.zeros(nbVars)
+    cost[:zStart] = np.concatenate([c for _, c in levels])
+    cost[zStart:nStart] = instance.turbine_cable_cost.ravel()
+    cost[cStart:qStart] = noFailure * instance.curtailing_cost * np.tile(probability, nbStations)
+    cost[qStart:] = noFailure * instance.curtailing_penalty * probability
+
+    rows, cols, vals, upper = [], [], [], []
+    nbRows = 0
+
+    def add(r, c, v):
+        rows.append(np.asarray(r).ravel())
+        cols.append(np.asarray(c).ravel())
+        vals.append(np.broadcast_to(v, np.shape(r)).ravel())
+
+    # At most one rating level per station: sum_level y[s, level] <= 1
+    add(nbRows + yStation, np.arange(zStart), 1.0)
+    upper.append(np.ones(nbStations))
+    nbRows += nbStations
+    # Turbines on opened stations only: z[t, s] - sum_level y[s, level] <= 0
+    ts = np.arange(nbTurbines * nbStations)
+    add(nbRows + ts, zStart + ts, 1.0)
+    pairRows = nbRows + np.arange(nbTurbines)[:, None] * nbStations + yStation[None, :]
+    add(pairRows, np.broadcast_to(np.arange(zStart), pairRows.shape), -1.0)
+    upper.append(np.zeros(nbTurbines * nbStations))
+    nbRows += nbTurbines * nbStations
+    # Curtailment: power[b] * n[s] - sum_level rating * y[s, level] - c[s, b] <= 0
+    sb = np.arange(nbStations * B)
+    add(nbRows + sb, nStart + sb // B, np.tile(power, nbStations))
+    levelRows = nbRows + yStation[:, None] * B + np.arange(B)[None, :]
+    add(levelRows, np.broadcast_to(np.arange(zStart)[:, None], levelRows.shape), -np.broadcast_to(yRating[:, None], levelRows.shape))
+    add(nbRows + sb, cStart + sb, -1.0)
+    upper.append(np.zeros(nbStations * B))
+    nbRows += nbStations * B
+    # Penalty: sum_s c[s, b] - q[b] <= maximum_curtailing
+    add(nbRows + np.tile(np.arange(B), nbStations), cStart + sb, 1.0)
+    add(nbRows + np.arange(B), qStart + np.arange(B), -1.0)
+    upper.append(np.full(B, instance.maximum_curtailing))
+    nbRows += B
+
+    A = coo_array((np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))), shape=(nbRows, nbVars)).tocsr()
+    # Every turbine is linked: sum_s z[t, s] = 1, and counted: sum_t z[t, s] - n[s] = 0
+    t, s = np.divmod(np.arange(nbTurbines * nbStations), nbStations)
+    Aeq = coo_array(
+        (
+            np.concatenate((np.ones(2 * len(t)), -np.ones(nbStations))),
+            (
+                np.concatenate((t, nbTurbines + s, nbTurbines + np.arange(nbStations))),
+                np.concatenate((zStart + ts, zStart + ts, nStart + np.arange(nbStations))),
+            ),
+        ),
+        shape=(nbTurbines + nbStations, nbVars),
+    ).tocsr()
+    bEq = np.concatenate((np.ones(nbTurbines), np.zeros(nbStations)))
+    options = {} if timeLimit is None else {"time_limit": timeLimit}
+    result = linprog(cost, A_ub=A, b_ub=np.concatenate(upper), A_eq=Aeq, b_eq=bEq, bounds=(0, None), method="highs-ipm", options=options)
+    if result.status == 1:
+        # Time limit reached
+        return None
+    if result.status != 0:
+        raise RuntimeError(f"Relaxation not solved: {result.message}")
+    return float(result.fun)
+
+
+def gap(cost, bound):
+    # Relative distance of a cost to the bound
+    return (cost - bound) / abs(cost) if cost else 0.0
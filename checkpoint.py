@@ -0,0 +1,42 @@
+import time
+
+import numpy as np
+
+from classes import replace_file
+
+
+class Checkpoint:
+    # Periodic save of the incumbent of a search, to <basePath>.npz (compact, for resuming)
+    # and <basePath>.json (competition format)
+    def __init__(self, basePath, period=60.0, everyIters=None) -> None:
+        # period: seconds between two saves, everyIters: iterations between two saves, None to ignore
+        self.npzPath = basePath + ".npz"
+        self.jsonPath = basePath + ".json"
+        self.period = period
+        self.everyIters = everyIters
+        self.savedCost = np.inf
+        self.nbSaves = 0
+        self._lastTime = time.perf_counter()
+        self._iters = 0
+
+        return None
+
+    def step(self, evaluator):
+        # Called once per iteration; saves the current solution when due and better than the saved one
+        self._iters += 1
+        due = (self.period is not None and time.perf_counter() - self._lastTime >= self.period) or (
+            self.everyIters is not None and self._iters >= self.everyIters
+        )
+        if due:
+            self.save(evaluator.sol, evaluator.cost)
+
+    def save(self, sol, cost):
+        self._lastTime = time.perf_counter()
+        self._iters = 0
+        if cost >= self.savedCost:
+            return False
+        replace_file(self.npzPath, sol.save_npz)
+        replace_file(self.jsonPath, sol.export_solution_json, "w")
+        self.savedCost = cost
+        self.nbSaves += 1
+        return True
@@ -1,4 +1,8 @@
 import json
+import os
+import tempfile
+import zipfile
+from functools import cached_property
 from typing import List
 import numpy as np
 from logzero import logger
@@ -84,8 +88,11 @@ class Station(CoordinatePoint):
 
 
 class LandStation(Station):
-    def __init__(self) -> None:
+    def __init__(self, dict=None) -> None:
         args = {"id": 0, "x": 0, "y": 0}
+        if dict is not None:
+            args["x"] = dict["x"]
+            args["y"] = dict["y"]
         super().__init__(args)
 
 
@@ -114,14 +121,153 @@ class Substation(Station):
         return None
 
 
-class Instance:
-    stations: List[Station]
-    turbines: List[Turbine]
-    land_to_sub_cables: List[LandToSubstationCable]
-    sub_sub_cable_types: List[SubstationToSubstationCable]
-    scenarios: List[Scenario]
-    substation_types: List[SubstationType]
+def non_dominated(lower_is_better, higher_is_better):
+    # Indexes of the items not dominated by another one, the first of identical items is kept
+    lower = np.column_stack(lower_is_better)
+    higher = np.column_stack(higher_is_better)
+    # [i, j] j is at least as good as i on every criterion
+    as_good = (lower[None, :, :] <= lower[:, None, :]).all(axis=2) & (higher[None, :, :] >= higher[:, None, :]).all(axis=2)
+    better = (lower[None, :, :] < lower[:, None, :]).any(axis=2) | (higher[None, :, :] > higher[:, None, :]).any(axis=2)
+    index = np.arange(len(lower))
+    dominated = (as_good & (better | (index[None, :] < index[:, None]))).any(axis=1)
+    return np.flatnonzero(~dominated)
+
+
+# Columns of an instance, as stored in its binary cache
+INSTANCE_COLUMNS = [
+    "turbine_ids", "turbine_coords", "station_ids", "station_coords", "land_coords",
+    "scenario_ids", "scenario_power", "scenario_probability",
+    "substation_ids", "substation_cost", "substation_rating", "substation_failure",
+    "land_cable_ids", "land_cable_rating", "land_cable_failure", "land_cable_fixed_cost", "land_cable_variable_cost",
+    "sub_cable_ids", "sub_cable_rating", "sub_cable_fixed_cost", "sub_cable_variable_cost",
+    "fixed_cost_cable", "variable_cost_cables", "curtailing_penalty", "curtailing_cost",
+    "maximum_power", "maximum_curtailing",
+]
+INSTANCE_CACHE_VERSION = 2
+
+
+def read_instance_columns(filepath):
+    with open(filepath, "r") as f:
+        data = json.load(f)
+
+    def column(items, key, default=None):
+        return np.array([item.get(key, default) for item in items], dtype=float)
+
+    def coords(items):
+        return np.array([[item["x"], item["y"]] for item in items], dtype=float).reshape(-1, 2)
+
+    columns = {}
+
+    turbines = data["wind_turbines"]
+    columns["turbine_ids"] = column(turbines, "id").astype(int)
+    columns["turbine_coords"] = coords(turbines)
+
+    stations = data["substation_locations"]
+    columns["station_ids"] = column(stations, "id").astype(int)
+    columns["station_coords"] = coords(stations)
+
+    scenarios = data["wind_scenarios"]
+    columns["scenario_ids"] = column(scenarios, "id").astype(int)
+    columns["scenario_power"] = column(scenarios, "power_generation")
+    columns["scenario_probability"] = column(scenarios, "probability")
+
+    substation_types = data["substation_types"]
+    columns["substation_ids"] = column(substation_types, "id").astype(int)
+    columns["substation_cost"] = column(substation_types, "cost")
+    columns["substation_rating"] = column(substation_types, "rating")
+    columns["substation_failure"] = column(substation_types, "probability_of_failure")
+
+    land_cables = data["land_substation_cable_types"]
+    columns["land_cable_ids"] = column(land_cables, "id").astype(int)
+    columns["land_cable_rating"] = column(land_cables, "rating")
+    columns["land_cable_failure"] = column(land_cables, "probability_of_failure", 0)
+    columns["land_cable_fixed_cost"] = column(land_cables, "fixed_cost")
+    columns["land_cable_variable_cost"] = column(land_cables, "variable_cost")
+
+    sub_cables = data["substation_substation_cable_types"]
+    columns["sub_cable_ids"] = column(sub_cables, "id").astype(int)
+    columns["sub_cable_rating"] = column(sub_cables, "rating")
+    columns["sub_cable_fixed_cost"] = column(sub_cables, "fixed_cost")
+    columns["sub_cable_variable_cost"] = column(sub_cables, "variable_cost")
+
+    general_params = data["general_parameters"]
+    land = general_params.get("main_land_station", {"x": 0, "y": 0})
+    columns["land_coords"] = np.array([land["x"], land["y"]], dtype=float)
+    columns["fixed_cost_cable"] = general_params["fixed_cost_cable"]
+    columns["variable_cost_cables"] = general_params["variable_cost_cable"]
+    columns["curtailing_penalty"] = general_params["curtailing_penalty"]
+    columns["curtailing_cost"] = general_params["curtailing_cost"]
+    columns["maximum_power"] = general_params["maximum_power"]
+    columns["maximum_curtailing"] = general_params["maximum_curtailing"]
+
+    return columns
+
+
+def pack_instance_columns(columns):
+    # Every column in a single float buffer, with the layout needed to unpack it
+    layout, start = {}, 0
+    for name in INSTANCE_COLUMNS:
+        value = np.asarray(columns[name])
+        layout[name] = (start, value.shape, value.dtype.str)
+        start += value.size
+    data = np.concatenate([np.asarray(columns[name], dtype=float).ravel() for name in INSTANCE_COLUMNS])
+    return layout, data
+
+
+def unpack_instance_columns(layout, data):
+    # Float columns are views of data
+    columns = {}
+    for name, (start, shape, dtype) in layout.items():
+        size = int(np.prod(shape))
+        columns[name] = data[start : start + size].reshape(shape).astype(dtype, copy=False)
+    return columns
+
+
+def replace_file(path, write, mode="wb"):
+    # Calls write on an open temporary file of the directory of path, then renames it to path:
+    # a killed run never leaves a truncated file, and concurrent writers never share a temporary file
+    directory, name = os.path.split(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory or ".", prefix=name + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode) as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def load_instance_columns(filepath, use_cache=True):
+    # Columns of the JSON instance, reused from the .npz cache next to it while the JSON is unchanged.
+    # The cache holds every column in a single buffer, so loading it is a single read.
+    cache_path = os.path.splitext(filepath)[0] + ".npz"
+    stat = os.stat(filepath)
+    key = np.array([INSTANCE_CACHE_VERSION, stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+
+    if use_cache and os.path.exists(cache_path):
+        # A damaged cache is rebuilt from the JSON
+        try:
+            with np.load(cache_path) as cache:
+                if np.array_equal(cache["key"], key):
+                    return unpack_instance_columns(json.loads(cache["layout"].tobytes()), cache["data"])
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile) as e:
+            logger.warning(f"Could not read instance cache {cache_path}: {e}")
+
+    columns = read_instance_columns(filepath)
+    if use_cache:
+        layout, data = pack_instance_columns(columns)
+        try:
+            replace_file(
+                cache_path,
+                lambda f: np.savez(f, key=key, layout=np.frombuffer(json.dumps(layout).encode(), dtype=np.uint8), data=data),
+            )
+        except OSError as e:
+            logger.warning(f"Could not write instance cache {cache_path}: {e}")
+
+    return columns
+
 
+class Instance:
     fixed_cost_cable: float
     variable_cost_cables: float
     curtailing_penalty: float
@@ -129,145 +275,602 @@ class Instance:
     maximum_power: float
     maximum_curtailing: float
 
-    def __init__(self, filepath) -> None:
-        with open(filepath, "r") as f:
-            data = json.load(f)
-
-        # Land substation cable types
-        self.land_to_sub_cables = []
-        land_substation_cable_types = data["land_substation_cable_types"]
-        for land_substation_cable_type in land_substation_cable_types:
-            new_cable = LandToSubstationCable(land_substation_cable_type)
-            self.land_to_sub_cables.append(new_cable)
-
-        # Substation to sub cable types
-        self.sub_to_sub_cables = []
-        sub_sub_cable_types = data["substation_substation_cable_types"]
-        for sub_sub_cable_type in sub_sub_cable_types:
-            new_cable = SubstationToSubstationCable(sub_sub_cable_type)
-            self.sub_to_sub_cables.append(new_cable)
-
-        # Turbines
-        self.turbines = []
-        turbines = data["wind_turbines"]
-        for turbine in turbines:
-            new_turbine = Turbine(turbine)
-            self.turbines.append(new_turbine)
-
-        # Wind scenarios
-        self.scenarios = []
-        scenarios = data["wind_scenarios"]
-        for scenario in scenarios:
-            new_scenario = Scenario(scenario)
-            self.scenarios.append(new_scenario)
-
-        # Stations
-        self.stations = []
-        stations = data["substation_locations"]
-        for station in stations:
-            new_station = Station(station)
-            self.stations.append(new_station)
-
-        # Substation types
-        self.substation_types = []
-        substation_types = data["substation_types"]
-        for substation_type in substation_types:
-            new_substation_type = SubstationType(substation_type)
-            self.substation_types.append(new_substation_type)
-
-        general_params = data["general_parameters"]
-
-        self.fixed_cost_cable = general_params["fixed_cost_cable"]
-        self.variable_cost_cables = general_params["variable_cost_cable"]
-        self.curtailing_penalty = general_params["curtailing_penalty"]
-        self.curtailing_cost = general_params["curtailing_cost"]
-        self.maximum_power = general_params["maximum_power"]
-        self.maximum_curtailing = general_params["maximum_curtailing"]
+    # Largest number of (type, cable, n) entries kept in the station cost table
+    max_cost_table_entries = 10**6
+
+    def __init__(self, filepath=None, use_cache=True, columns=None) -> None:
+        # File the instance was read from, None when built from columns
+        self.filepath = filepath
+        if columns is None:
+            columns = load_instance_columns(filepath, use_cache)
+        for name in INSTANCE_COLUMNS:
+            value = columns[name]
+            setattr(self, name, np.asarray(value).item() if np.ndim(value) == 0 else value)
+
+        # n -> [substation type, land cable type] expected operating cost of a station with n turbines
+        self.cost_table = {}
+
+        # Scenarios sorted by power generation, with cumulative probability and probability-weighted power
+        self.scenario_order = np.argsort(self.scenario_power, kind="stable")
+        self.sorted_power = self.scenario_power[self.scenario_order]
+        self.cum_probability = np.concatenate(([0], np.cumsum(self.scenario_probability[self.scenario_order])))
+        self.cum_weighted_power = np.concatenate(
+            ([0], np.cumsum((self.scenario_probability * self.scenario_power)[self.scenario_order]))
+        )
+        self.mean_power = self.cum_weighted_power[-1]
+
+        # Types worth considering: no other one is cheaper, with a higher rating and a lower probability of failure
+        self.substation_type_candidates = non_dominated(
+            (self.substation_cost, self.substation_failure), (self.substation_rating,)
+        )
+        self.land_cable_candidates = non_dominated(
+            (self.land_cable_fixed_cost, self.land_cable_variable_cost, self.land_cable_failure),
+            (self.land_cable_rating,),
+        )
+        self.sub_cable_candidates = non_dominated(
+            (self.sub_cable_fixed_cost, self.sub_cable_variable_cost), (self.sub_cable_rating,)
+        )
+
+        # Distances: [t, s] turbine to station, [s] station to land, [s1, s2] station to station
+        self.turbine_station_dist = np.linalg.norm(
+            self.turbine_coords[:, None, :] - self.station_coords[None, :, :], axis=2
+        )
+        self.station_land_dist = np.linalg.norm(self.station_coords - self.land_coords, axis=1)
+        self.station_station_dist = np.linalg.norm(
+            self.station_coords[:, None, :] - self.station_coords[None, :, :], axis=2
+        )
+
+        # Cable costs: [t, s] turbine cable, [s, cable] land cable, [s1, s2, cable] substation cable
+        self.turbine_cable_cost = self.fixed_cost_cable + self.variable_cost_cables * self.turbine_station_dist
+        self.land_cable_cost = (
+            self.land_cable_fixed_cost[None, :]
+            + self.land_cable_variable_cost[None, :] * self.station_land_dist[:, None]
+        )
+        self.sub_cable_cost = (
+            self.sub_cable_fixed_cost[None, None, :]
+            + self.sub_cable_variable_cost[None, None, :] * self.station_station_dist[:, :, None]
+        )
 
         return None
 
+    def expected_curtailment(self, nb_turbines, capacity, low=-np.inf, high=np.inf):
+        # Expectation of max(nb_turbines * power - capacity, 0) over the scenarios with low < power <= high
+        nb_turbines = np.asarray(nb_turbines, dtype=float)
+        capacity = np.asarray(capacity, dtype=float)
+        # Power above which the turbines are curtailed
+        threshold = np.where(capacity < 0, -np.inf, np.inf) * np.ones_like(nb_turbines)
+        np.divide(capacity, nb_turbines, out=threshold, where=nb_turbines > 0)
+        first = np.searchsorted(self.sorted_power, np.maximum(threshold, low), side="right")
+        last = np.maximum(first, np.searchsorted(self.sorted_power, high, side="right"))
+        return nb_turbines * (self.cum_weighted_power[last] - self.cum_weighted_power[first]) - capacity * (
+            self.cum_probability[last] - self.cum_probability[first]
+        )
+
+    def curtailment_cost(self, curtailment):
+        # Cost of a curtailed power: linear cost plus penalty above maximum_curtailing
+        return self.curtailing_cost * curtailment + self.curtailing_penalty * np.maximum(
+            curtailment - self.maximum_curtailing, 0
+        )
+
+    def failure_extra_curtailment(self, n, r, has_partner, link, other_n, other_r, power):
+        # [..., scenarios] curtailment added by the failure of a station of n turbines and rating r:
+        # its power is redirected to its partner (of other_n turbines and rating other_r) up to the
+        # link rating, the rest is lost
+        load = n[..., None] * power
+        curtailed = np.maximum(load - r[..., None], 0)
+        redirected = np.minimum(load, link[..., None])
+        other_load = other_n[..., None] * power
+        partner_extra = np.where(
+            has_partner[..., None],
+            np.maximum(other_load + redirected - other_r[..., None], 0) - np.maximum(other_load - other_r[..., None], 0),
+            0,
+        )
+        return load - redirected - curtailed + partner_extra
+
+    def expected_failure_extra(self, n, r, has_partner, link, other_n, other_r):
+        # Expectation of failure_extra_curtailment over the scenarios: every term is piecewise linear in the power
+        # The partner receives all the power of the station below the link saturation, link above
+        saturation = np.full(np.shape(n), np.inf)
+        np.divide(link, n, out=saturation, where=n > 0)
+        no_bound = np.full(np.shape(n), np.inf)
+        lost, curtailed, below, above, other_curtailed = self.expected_curtailment(
+            np.stack((n, n, other_n + n, other_n, other_n)),
+            np.stack((link, r, other_r, other_r - link, other_r)),
+            np.stack((-no_bound, -no_bound, -no_bound, saturation, -no_bound)),
+            np.stack((no_bound, no_bound, saturation, no_bound, no_bound)),
+        )
+        return lost - curtailed + np.where(has_partner, below + above - other_curtailed, 0)
+
     def get_nb_turbines(self):
-        return len(self.turbines)
+        return len(self.turbine_coords)
+
+    def get_nb_stations(self):
+        return len(self.station_coords)
+
+    def get_columns(self):
+        return {name: getattr(self, name) for name in INSTANCE_COLUMNS}
+
+    @cached_property
+    def turbine_station_order(self):
+        # [t, k] k-th nearest station of turbine t
+        return np.argsort(self.turbine_station_dist, axis=1, kind="stable")
+
+    @cached_property
+    def turbine_station_rank(self):
+        # [t, s] rank of station s by distance to turbine t, inverse of turbine_station_order
+        rank = np.empty_like(self.turbine_station_order)
+        np.put_along_axis(rank, self.turbine_station_order, np.arange(self.get_nb_stations())[None, :], axis=1)
+        return rank
+
+    # Objects, built on first access from the columns
+
+    @cached_property
+    def turbines(self) -> List[Turbine]:
+        return [Turbine({"id": i, "x": x, "y": y}) for i, (x, y) in zip(self.turbine_ids.tolist(), self.turbine_coords.tolist())]
+
+    @cached_property
+    def stations(self) -> List[Station]:
+        return [Station({"id": i, "x": x, "y": y}) for i, (x, y) in zip(self.station_ids.tolist(), self.station_coords.tolist())]
+
+    @cached_property
+    def land_station(self) -> LandStation:
+        return LandStation({"x": self.land_coords[0], "y": self.land_coords[1]})
+
+    @cached_property
+    def scenarios(self) -> List[Scenario]:
+        return [
+            Scenario({"id": i, "power_generation": power, "probability": probability})
+            for i, power, probability in zip(
+                self.scenario_ids.tolist(), self.scenario_power.tolist(), self.scenario_probability.tolist()
+            )
+        ]
+
+    @cached_property
+    def substation_types(self) -> List[SubstationType]:
+        return [
+            SubstationType({"id": i, "cost": cost, "rating": rating, "probability_of_failure": failure})
+            for i, cost, rating, failure in zip(
+                self.substation_ids.tolist(),
+                self.substation_cost.tolist(),
+                self.substation_rating.tolist(),
+                self.substation_failure.tolist(),
+            )
+        ]
+
+    @cached_property
+    def land_to_sub_cables(self) -> List[LandToSubstationCable]:
+        return [
+            LandToSubstationCable(
+                {"id": i, "rating": rating, "probability_of_failure": failure, "fixed_cost": fixed, "variable_cost": variable}
+            )
+            for i, rating, failure, fixed, variable in zip(
+                self.land_cable_ids.tolist(),
+                self.land_cable_rating.tolist(),
+                self.land_cable_failure.tolist(),
+                self.land_cable_fixed_cost.tolist(),
+                self.land_cable_variable_cost.tolist(),
+            )
+        ]
+
+    @cached_property
+    def sub_to_sub_cables(self) -> List[SubstationToSubstationCable]:
+        return [
+            SubstationToSubstationCable({"id": i, "rating": rating, "fixed_cost": fixed, "variable_cost": variable})
+            for i, rating, fixed, variable in zip(
+                self.sub_cable_ids.tolist(),
+                self.sub_cable_rating.tolist(),
+                self.sub_cable_fixed_cost.tolist(),
+                self.sub_cable_variable_cost.tolist(),
+            )
+        ]
+
+    def station_operating_costs(self, nb_turbines, station_types=None, land_cables=None):
+        # [..., substation type, land cable type] expected operating cost of a station alone with nb_turbines
+        # (any shape): the curtailment penalty applies above maximum_curtailing, all the power is lost on failure.
+        # Substation cables are not counted. Restricted to the given types when not None
+        station_types = np.arange(len(self.substation_cost)) if station_types is None else station_types
+        land_cables = np.arange(len(self.land_cable_rating)) if land_cables is None else land_cables
+        nb_turbines = np.asarray(nb_turbines, dtype=float)[..., None, None]
+        rating = np.minimum(self.substation_rating[station_types][:, None], self.land_cable_rating[land_cables][None, :])
+        failure = self.substation_failure[station_types][:, None] + self.land_cable_failure[land_cables][None, :]
+
+        shape = np.broadcast_shapes(nb_turbines.shape, rating.shape)
+        turbines = np.broadcast_to(nb_turbines, shape)
+        curtailed = self.expected_curtailment(turbines, np.broadcast_to(rating, shape))
+        penalized = self.expected_curtailment(turbines, np.broadcast_to(rating + self.maximum_curtailing, shape))
+        lost = self.expected_curtailment(nb_turbines, self.maximum_curtailing)
+        return (1 - failure) * (self.curtailing_cost * curtailed + self.curtailing_penalty * penalized) + failure * (
+            self.curtailing_cost * nb_turbines * self.mean_power + self.curtailing_penalty * lost
+        )
+
+    def station_cost_table(self, nb_turbines):
+        # [substation type, land cable type] station_operating_costs for nb_turbines, cached
+        if nb_turbines not in self.cost_table:
+            table = self.station_operating_costs(nb_turbines)
+            # Memory cap: forget the oldest entries
+            while self.cost_table and (len(self.cost_table) + 1) * table.size > self.max_cost_table_entries:
+                del self.cost_table[next(iter(self.cost_table))]
+            self.cost_table[nb_turbines] = table
+        return self.cost_table[nb_turbines]
+
+    def station_operating_cost(self, station_type, land_cable, nb_turbines):
+        return self.station_cost_table(nb_turbines)[station_type, land_cable]
+
+    def cheapest_station_config(self, nb_turbines, station=None):
+        # (substation type, land cable type) of least building plus operating cost for nb_turbines,
+        # the land cable cost is counted when the station is given
+        total = self.station_cost_table(nb_turbines) + self.substation_cost[:, None]
+        if station is not None:
+            total = total + self.land_cable_cost[station][None, :]
+        station_type, land_cable = np.unravel_index(np.argmin(total), total.shape)
+        return int(station_type), int(land_cable)
+
+    def cheapest_station_configs(self):
+        # cheapest_station_config of every station for every number of turbines:
+        # [s, n] least building plus operating cost, and the matching substation and land cable types
+        nb_turbines = np.arange(self.get_nb_turbines() + 1)
+        types, cables = self.substation_type_candidates, self.land_cable_candidates
+        operating = self.station_operating_costs(nb_turbines, types, cables)
+
+        # Best substation type for each land cable, then best land cable of each station
+        total = operating + self.substation_cost[types][None, :, None]
+        best_type = np.argmin(total, axis=1)
+        total = np.take_along_axis(total, best_type[:, None, :], axis=1)[:, 0, :]
+        cost = np.full((self.get_nb_stations(), len(nb_turbines)), np.inf)
+        cable = np.zeros(cost.shape, dtype=int)
+        for c in range(len(cables)):
+            with_cable = total[None, :, c] + self.land_cable_cost[:, cables[c], None]
+            better = with_cable < cost
+            cost[better], cable[better] = with_cable[better], c
+        station_type = types[best_type[nb_turbines[None, :], cable]]
+
+        return cost, station_type, cables[cable]
+
+
+# Entries of the [solutions, stations, scenarios] temporaries of a block of operational_costs
+OPERATIONAL_BLOCK_ENTRIES = 2**16
+# Scenarios, evenly spread by power, at which operational_costs looks for the curtailment penalty
+PENALTY_GRID_SIZE = 16
+
+
+def construction_costs(instance, turbine_station, station_type, land_cable, partner, sub_cable):
+    # Construction cost of P solutions given as stacked arrays: [P, turbines] and [P, stations]
+    inst = instance
+    stations = np.arange(inst.get_nb_stations())
+    open_stations = station_type >= 0
+    cost = np.where(open_stations, inst.substation_cost[station_type], 0).sum(axis=1)
+
+    # Land cables
+    cost += np.where(open_stations & (land_cable >= 0), inst.land_cable_cost[stations, land_cable], 0).sum(axis=1)
+
+    # Substation to substation cables, each one counted once
+    first = partner > stations
+    cost += np.where(first, inst.sub_cable_cost[stations, partner, sub_cable], 0).sum(axis=1)
+
+    # Turbine cables
+    turbines = np.arange(inst.get_nb_turbines())
+    cost += np.where(turbine_station >= 0, inst.turbine_cable_cost[turbines, turbine_station], 0).sum(axis=1)
+
+    return cost
+
+
+def operational_costs(instance, turbine_station, station_type, land_cable, partner, sub_cable):
+    # Expected operational cost of P solutions given as stacked arrays
+    inst = instance
+    nb_solutions, nb_stations = station_type.shape
+    solutions = np.arange(nb_solutions)[:, None]
+
+    open_stations = station_type >= 0
+    rating = np.where(
+        open_stations,
+        np.minimum(inst.substation_rating[station_type], inst.land_cable_rating[land_cable]),
+        0,
+    )
+    failure = np.where(
+        open_stations,
+        inst.substation_failure[station_type] + inst.land_cable_failure[land_cable],
+        0,
+    )
+    # [P, s] number of turbines linked to s
+    linked = turbine_station >= 0
+    nb_turbines = np.bincount(
+        (turbine_station + nb_stations * solutions)[linked], minlength=nb_solutions * nb_stations
+    ).reshape(nb_solutions, nb_stations)
+    has_partner = partner >= 0
+    other = np.where(has_partner, partner, 0)
+    cable_rating = np.where(has_partner, inst.sub_cable_rating[sub_cable], 0)
+    failure_params = (
+        nb_turbines,
+        rating,
+        has_partner,
+        cable_rating,
+        np.where(has_partner, nb_turbines[solutions, other], 0),
+        np.where(has_partner, rating[solutions, other], 0),
+    )
+
+    # Linear cost, from the prefix sums over the scenarios sorted by power
+    curtailed = inst.expected_curtailment(nb_turbines, rating).sum(axis=1)
+    extra = inst.expected_failure_extra(*failure_params)
+    costs = inst.curtailing_cost * (curtailed + (failure * extra).sum(axis=1))
+
+    # Every curtailment grows with the power, so the penalty only applies above the first power at which
+    # it does: it is looked for on a grid of powers ending with the highest one
+    nb_scenarios = len(inst.sorted_power)
+    grid = np.linspace(0, nb_scenarios - 1, min(PENALTY_GRID_SIZE, nb_scenarios)).astype(int)
+    power = inst.sorted_power[grid]
+    grid_total = np.maximum(nb_turbines[:, :, None] * power - rating[:, :, None], 0).sum(axis=1)
+    grid_extra = np.where((failure > 0)[:, :, None], inst.failure_extra_curtailment(*failure_params, power), -np.inf)
+    penalized = np.maximum(grid_total, grid_total + grid_extra.max(axis=1)) > inst.maximum_curtailing
+    # [P] first sorted scenario that may be penalized, nb_scenarios if none
+    first = np.where(penalized.any(axis=1), np.argmax(penalized, axis=1), len(grid))
+    start = np.concatenate(([0], grid[:-1] + 1, [nb_scenarios]))[first]
+
+    # Penalty over these scenarios only, by blocks of solutions of close start whose temporaries stay in cache
+    slow = np.flatnonzero(start < nb_scenarios)
+    slow = slow[np.argsort(start[slow], kind="stable")]
+    active = open_stations | has_partner | (nb_turbines > 0)
+    entries = max(1, active[slow].sum(axis=1).max(initial=0)) * (nb_scenarios - start[slow].min(initial=0))
+    block_size = max(1, OPERATIONAL_BLOCK_ENTRIES // entries)
+    for i in range(0, len(slow), block_size):
+        block = slow[i : i + block_size]
+        scenarios = inst.scenario_order[start[block[0]] :]
+        costs[block] += _expected_penalties(
+            inst,
+            active[block],
+            rating[block],
+            failure[block],
+            nb_turbines[block],
+            partner[block],
+            cable_rating[block],
+            inst.scenario_power[scenarios],
+            inst.scenario_probability[scenarios],
+        )
+    return costs
+
+
+def _expected_penalties(inst, active, rating, failure, nb_turbines, partner, cable_rating, power, probability):
+    # Expected curtailment penalty of P solutions over the given scenarios
+    nb_solutions, nb_stations = rating.shape
+    solutions = np.arange(nb_solutions)[:, None]
+
+    # Only the active stations count: they are moved to the first columns
+    has_partner = partner >= 0
+    columns = np.argsort(~active, axis=1, kind="stable")[:, : max(1, active.sum(axis=1).max())]
+    active = active[solutions, columns]
+    position = np.zeros((nb_solutions, nb_stations), dtype=int)
+    position[solutions, columns] = np.arange(columns.shape[1])[None, :]
+    rating = np.where(active, rating[solutions, columns], 0)
+    failure = np.where(active, failure[solutions, columns], 0)
+    nb_turbines = np.where(active, nb_turbines[solutions, columns], 0)
+    cable_rating = cable_rating[solutions, columns]
+    other = np.where(has_partner, position[solutions, np.where(has_partner, partner, 0)], 0)[solutions, columns]
+    has_partner = active & has_partner[solutions, columns]
+
+    # [P, s, scen] power produced by the turbines of s and curtailed at s with no failure
+    power = nb_turbines[:, :, None] * power[None, None, :]
+    curtailed = np.maximum(power - rating[:, :, None], 0)
+    curtailed_total = curtailed.sum(axis=1)
+
+    # Failure of s: power is redirected to its partner up to the cable rating, the rest is lost
+    redirected = np.minimum(power, np.where(has_partner, cable_rating, 0)[:, :, None])
+    partner_curtailed = np.where(
+        has_partner[:, :, None],
+        np.maximum(power[solutions, other] + redirected - rating[solutions, other][:, :, None], 0) - curtailed[solutions, other],
+        0,
+    )
+    curtailed_failure = curtailed_total[:, None, :] - curtailed + (power - redirected) + partner_curtailed
+
+    no_failure = (1 - failure.sum(axis=1))[:, None] * np.maximum(curtailed_total - inst.maximum_curtailing, 0)
+    with_failure = np.einsum("ps,psw->pw", failure, np.maximum(curtailed_failure - inst.maximum_curtailing, 0))
+
+    return inst.curtailing_penalty * (no_failure + with_failure) @ probability
 
 
 class Solution:
     instance: Instance
 
-    # Shape (nb_positions_substations, nb_substation_types)
-    x: np.ndarray
+    # [t] substation linked to turbine t, -1 if none
+    turbine_station: np.ndarray
 
-    # Cables offshore to onshore: shape (nb_substations, nb_cable_types)
-    y_off_on: np.ndarray
+    # [s] substation type built at s, -1 if the station is closed
+    station_type: np.ndarray
 
-    # Cables offshore to offshore: shape (nb_substations, nb_substations, nb_types_cables_sub_to_sub)
-    y_off_off: np.ndarray
+    # [s] cable type between s and the land station, -1 if none
+    land_cable: np.ndarray
 
-    # shape (nb_turbines, nb_substations)
-    z: np.ndarray
+    # Cables offshore to offshore: (s1, s2) with s1 < s2 -> cable type
+    sub_cables: dict
 
-    def __init__(self, instance, x, y_off_on, y_off_off, z) -> None:
+    def __init__(self, instance, turbine_station, station_type, land_cable, sub_cables=None) -> None:
         self.instance = instance
-        self.x = x
-        self.y_off_on = y_off_on
-        self.y_off_off = y_off_off
-        self.z = z
+        self.turbine_station = np.asarray(turbine_station, dtype=int)
+        self.station_type = np.asarray(station_type, dtype=int)
+        self.land_cable = np.asarray(land_cable, dtype=int)
+        self.sub_cables = {} if sub_cables is None else dict(sub_cables)
 
         return None
 
+    @classmethod
+    def from_one_hot(cls, instance, x, y_off_on, y_off_off, z):
+        station_type = np.where(x.any(axis=1), np.argmax(x, axis=1), -1)
+        land_cable = np.where(y_off_on.any(axis=1), np.argmax(y_off_on, axis=1), -1)
+        turbine_station = np.where(z.any(axis=1), np.argmax(z, axis=1), -1)
+        sub_cables = {}
+        for i, j, c in zip(*np.nonzero(y_off_off)):
+            sub_cables[(int(min(i, j)), int(max(i, j)))] = int(c)
+
+        return cls(instance, turbine_station, station_type, land_cable, sub_cables)
+
+    def to_one_hot(self):
+        return self._one_hot_x(), self._one_hot_y_off_on(), self._one_hot_y_off_off(), self._one_hot_z()
+
+    def _one_hot_x(self):
+        # Shape (nb_positions_substations, nb_substation_types)
+        x = np.zeros((self.instance.get_nb_stations(), len(self.instance.substation_cost)), dtype=int)
+        open_stations = np.flatnonzero(self.station_type >= 0)
+        x[open_stations, self.station_type[open_stations]] = 1
+        return x
+
+    def _one_hot_y_off_on(self):
+        # Cables offshore to onshore: shape (nb_substations, nb_cable_types)
+        y_off_on = np.zeros((self.instance.get_nb_stations(), len(self.instance.land_cable_rating)), dtype=int)
+        linked = np.flatnonzero(self.land_cable >= 0)
+        y_off_on[linked, self.land_cable[linked]] = 1
+        return y_off_on
+
+    def _one_hot_y_off_off(self):
+        # Cables offshore to offshore: shape (nb_substations, nb_substations, nb_types_cables_sub_to_sub)
+        nb_stations = self.instance.get_nb_stations()
+        y_off_off = np.zeros((nb_stations, nb_stations, len(self.instance.sub_cable_rating)), dtype=int)
+        for (i, j), c in self.sub_cables.items():
+            y_off_off[i, j, c] = 1
+        return y_off_off
+
+    def _one_hot_z(self):
+        # shape (nb_turbines, nb_substations)
+        z = np.zeros((self.instance.get_nb_turbines(), self.instance.get_nb_stations()), dtype=int)
+        linked = np.flatnonzero(self.turbine_station >= 0)
+        z[linked, self.turbine_station[linked]] = 1
+        return z
+
+    # Read-only views built from the compact arrays: a change goes through the arrays, or from_one_hot
+
+    @staticmethod
+    def _read_only(array):
+        array.flags.writeable = False
+        return array
+
+    @property
+    def x(self):
+        return self._read_only(self._one_hot_x())
+
+    @property
+    def y_off_on(self):
+        return self._read_only(self._one_hot_y_off_on())
+
+    @property
+    def y_off_off(self):
+        return self._read_only(self._one_hot_y_off_off())
+
+    @property
+    def z(self):
+        return self._read_only(self._one_hot_z())
+
+    def copy(self):
+        return Solution(
+            self.instance,
+            self.turbine_station.copy(),
+            self.station_type.copy(),
+            self.land_cable.copy(),
+            self.sub_cables,
+        )
+
     def export_solution_json(self, filepath):
-        # TODO
-        # Substations open
-        # substation_substation_cables
-        # turbines
-
-        result = {"substations": [], "substation_substation_cables": [], "turbines": []}
-
-        for i, line in enumerate(self.x):
-            local = {}
-            if not np.any(line == 1):
-                continue
-            id_type = int(np.argmax(line))
-            local["id"] = i + 1
-            local["substation_type"] = id_type + 1
-
-            cable_type_id = int(np.argmax(self.y_off_on[i]))
-            local["land_cable_type"] = cable_type_id + 1
-
-            result["substations"].append(local)
-
-        # Substation to substation cables
-
-        for i, line in enumerate(self.y_off_off):
-            local = {}
-            sub_sub_cable_type = -1
-            for j in range(i, self.y_off_off.shape[1]):
-                if not np.any(self.y_off_off[i, j, :] == 1):
-                    continue
-                sub_sub_cable_type = int(np.argmax(self.y_off_off[i, j, :]) + 1)
-            if sub_sub_cable_type == -1 :
-                continue
-            local["substation_id"] = i + 1
-            local["other_substation_id"] = j + 1
-            local["cable_type"] = sub_sub_cable_type
-
-            result["substation_substation_cables"].append(local)
-
-        # Turbines
-        for i, line in enumerate(self.z):
-            local = {}
-            if not np.any(line == 1):
-                continue
-            id_sub = int(np.argmax(self.z[i]) + 1)
-            local["id"] = i + 1
-            local["substation_id"] = id_sub
-            result["turbines"].append(local)
-
-        with open(filepath, "w") as f:
-            print(result)
-            json.dump(result, f)
-
-        logger.info("Results exported to JSON.")
-
-        #  open_stations_types = np.argmax(self.x[np.any(self.x == 1, axis=1)], axis=1)
+        # Competition format, ids starting at 1; filepath may also be an open text file
+        open_stations = np.flatnonzero(self.station_type >= 0)
+        linked = np.flatnonzero(self.turbine_station >= 0)
+        sub_cables = sorted(self.sub_cables.items())
+        result = {
+            "substations": [
+                {"id": i, "substation_type": t, "land_cable_type": c}
+                for i, t, c in zip(
+                    (open_stations + 1).tolist(),
+                    (self.station_type[open_stations] + 1).tolist(),
+                    (self.land_cable[open_stations] + 1).tolist(),
+                )
+            ],
+            "substation_substation_cables": [
+                {"substation_id": int(i) + 1, "other_substation_id": int(j) + 1, "cable_type": int(c) + 1}
+                for (i, j), c in sub_cables
+            ],
+            "turbines": [
+                {"id": i, "substation_id": s}
+                for i, s in zip((linked + 1).tolist(), (self.turbine_station[linked] + 1).tolist())
+            ],
+        }
+
+        if hasattr(filepath, "write"):
+            json.dump(result, filepath)
+        else:
+            with open(filepath, "w") as f:
+                json.dump(result, f)
+
+        return None
+
+    def save_npz(self, filepath):
+        # Compact binary checkpoint; sub_cables as rows (s1, s2, cable type)
+        sub_cables = np.array([(i, j, c) for (i, j), c in sorted(self.sub_cables.items())], dtype=int).reshape(-1, 3)
+        np.savez(
+            filepath,
+            turbine_station=self.turbine_station,
+            station_type=self.station_type,
+            land_cable=self.land_cable,
+            sub_cables=sub_cables,
+        )
 
         return None
+
+    @classmethod
+    def from_json(cls, instance, filepath):
+        # Solution exported with export_solution_json
+        with open(filepath) as f:
+            data = json.load(f)
+
+        station_type = np.full(instance.get_nb_stations(), -1)
+        land_cable = np.full(instance.get_nb_stations(), -1)
+        for station in data["substations"]:
+            station_type[station["id"] - 1] = station["substation_type"] - 1
+            land_cable[station["id"] - 1] = station["land_cable_type"] - 1
+        turbine_station = np.full(instance.get_nb_turbines(), -1)
+        for turbine in data["turbines"]:
+            turbine_station[turbine["id"] - 1] = turbine["substation_id"] - 1
+        sub_cables = {}
+        for cable in data["substation_substation_cables"]:
+            i, j = cable["substation_id"] - 1, cable["other_substation_id"] - 1
+            sub_cables[(min(i, j), max(i, j))] = cable["cable_type"] - 1
+
+        return cls(instance, turbine_station, station_type, land_cable, sub_cables)
+
+    @classmethod
+    def from_npz(cls, instance, filepath):
+        # Checkpoint written with save_npz
+        with np.load(filepath) as data:
+            sub_cables = {(int(i), int(j)): int(c) for i, j, c in data["sub_cables"]}
+            return cls(instance, data["turbine_station"], data["station_type"], data["land_cable"], sub_cables)
+
+    @classmethod
+    def load(cls, instance, filepath):
+        # Exported JSON solution or .npz checkpoint, by extension
+        if filepath.endswith(".npz"):
+            return cls.from_npz(instance, filepath)
+        return cls.from_json(instance, filepath)
+
+    def get_sub_cables(self):
+        # [s] other end and cable type of the substation-substation cable of s, -1 if none
+        nb_stations = self.instance.get_nb_stations()
+        partner = np.full(nb_stations, -1)
+        cable = np.full(nb_stations, -1)
+        for (i, j), c in self.sub_cables.items():
+            partner[i], cable[i] = j, c
+            partner[j], cable[j] = i, c
+        return partner, cable
+
+    def get_nb_turbines(self):
+        # [s] number of turbines linked to s
+        linked = self.turbine_station[self.turbine_station >= 0]
+        return np.bincount(linked, minlength=self.instance.get_nb_stations())
+
+    def stacked(self):
+        # Arrays of the batched cost functions, for a population of one
+        partner, sub_cable = self.get_sub_cables()
+        return self.turbine_station[None], self.station_type[None], self.land_cable[None], partner[None], sub_cable[None]
+
+    def construction_cost(self):
+        return float(construction_costs(self.instance, *self.stacked())[0])
+
+    def operational_cost(self):
+        return float(operational_costs(self.instance, *self.stacked())[0])
+
+    def evaluate(self):
+        # KIRO objective: construction cost plus expected operational cost
+        return self.construction_cost() + self.operational_cost()
@@ -0,0 +1,569 @@
+import numpy as np
+from classes import Instance, Solution
+from hashing import CostCache, TabuList, ZobristKeys
+from spatialIndex import CandidateLists, NearestOpenStations
+
+
+######### MOVES
+
+
+class Move:
+    # Turbines to reassign and their new station
+    turbines: np.ndarray
+    targets: np.ndarray
+    # s -> (substation type, land cable type), (-1, -1) closes s
+    stations: dict
+    # (s1, s2) with s1 < s2 -> cable type, -1 removes the cable
+    subCables: dict
+
+    def __init__(self, turbines=(), targets=(), stations=None, subCables=None) -> None:
+        self.turbines = np.asarray(turbines, dtype=int)
+        self.targets = np.asarray(targets, dtype=int)
+        self.stations = {} if stations is None else stations
+        self.subCables = {} if subCables is None else subCables
+
+        return None
+
+
+class RelocateTurbine(Move):
+    def __init__(self, turbine, station) -> None:
+        super().__init__([turbine], [station])
+
+
+class ChangeStationType(Move):
+    def __init__(self, sol, station, stationType) -> None:
+        super().__init__(stations={station: (stationType, sol.land_cable[station])})
+
+
+class ChangeLandCable(Move):
+    def __init__(self, sol, station, cableType) -> None:
+        super().__init__(stations={station: (sol.station_type[station], cableType)})
+
+
+class OpenStation(Move):
+    def __init__(self, station, stationType, cableType, turbines=()) -> None:
+        super().__init__(turbines, np.full(len(turbines), station), {station: (stationType, cableType)})
+
+
+class CloseStation(Move):
+    # targets are the new stations of the turbines of the closed station
+    def __init__(self, sol, station, targets) -> None:
+        turbines = np.flatnonzero(sol.turbine_station == station)
+        super().__init__(turbines, targets, {station: (-1, -1)})
+
+
+class SetSubCable(Move):
+    def __init__(self, station, other, cableType) -> None:
+        if station == other:
+            raise ValueError(f"Substation cable from station {station} to itself")
+        super().__init__(subCables={(min(station, other), max(station, other)): cableType})
+
+
+######### EVALUATOR
+
+
+class Change:
+    # Result of a move, computed without touching the evaluator state
+    stations: np.ndarray # stations whose parameters change
+    rows: np.ndarray # stations whose failure case changes
+    nbTurbines: np.ndarray
+    rating: np.ndarray
+    failure: np.ndarray
+    partner: np.ndarray
+    linkRating: np.ndarray
+    expCurtailed: np.ndarray # [stations]
+    expExtra: np.ndarray # [rows]
+    peakCurtailed: np.ndarray # [stations]
+    peakExtra: np.ndarray # [rows]
+    # Scenario vectors, only computed when the curtailment penalty may be active
+    curtailed: np.ndarray = None # [stations, scen]
+    extra: np.ndarray = None # [rows, scen]
+    curtailedTotal: np.ndarray = None
+    constructionCost: float
+    operationalCost: float
+
+
+class IncrementalEvaluator:
+    instance: Instance
+    sol: Solution
+
+    nbTurbines: np.ndarray # [s] number of turbines linked to s
+    rating: np.ndarray # [s] power s can send on shore
+    failure: np.ndarray # [s] probability of failure of s or of its land cable
+    partner: np.ndarray # [s] station linked to s by a substation cable, -1 if none
+    linkRating: np.ndarray # [s] rating of the substation cable of s
+
+    curtailed: np.ndarray # [s, scen] power curtailed at s with no failure
+    extra: np.ndarray # [s, scen] additional curtailment if s fails
+    curtailedTotal: np.ndarray # [scen] total curtailment with no failure
+
+    # Expectations over the scenarios, and values in the scenario of highest power
+    expCurtailed: np.ndarray # [s]
+    expExtra: np.ndarray # [s]
+    peakCurtailed: np.ndarray # [s]
+    peakExtra: np.ndarray # [s]
+
+    constructionCost: float
+    operationalCost: float
+
+    nearestOpen: NearestOpenStations # nearest open station of each turbine
+    candidates: CandidateLists = None # granular neighborhoods, when enabled
+
+    # Solution hash, maintained once a cost cache or a tabu list is enabled
+    keys: ZobristKeys = None
+    hash: int = None
+    costCache: CostCache = None # hash -> cost of the solutions evaluated lately
+    tabu: TabuList = None # hashes of the solutions visited lately, their moves are rejected
+    lastDeltaCached = False
+    lastDeltaTabu = False
+
+    def __init__(self, instance, sol) -> None:
+        self.instance = instance
+        self.sol = sol
+        self.peakPower = instance.sorted_power[-1:]
+        self._lastMove = None
+        self._lastChange = None
+        self.refresh()
+
+        return None
+
+    @property
+    def cost(self):
+        return self.constructionCost + self.operationalCost
+
+    def useCandidates(self, k):
+        # Restrict the neighborhoods to the k nearest sites, with don't-look bits
+        self.candidates = CandidateLists(self.instance, k)
+
+    def useCostCache(self, maxSize):
+        self.costCache = CostCache(maxSize)
+        self._useHash()
+
+    def useTabu(self, tenure):
+        self.tabu = TabuList(tenure)
+        self._useHash()
+        self.tabu.add(self.hash)
+
+    def _useHash(self):
+        if self.keys is None:
+            self.keys = ZobristKeys(self.instance)
+            self.hash = self.keys.solutionHash(self.sol)
+
+    def refresh(self):
+        # Rebuild every cached quantity from the solution
+        inst = self.instance
+        sol = self.sol
+        nbStations = inst.get_nb_stations()
+        openStations = sol.station_type >= 0
+
+        self.nbTurbines = sol.get_nb_turbines()
+        self.rating = np.zeros(nbStations)
+        self.failure = np.zeros(nbStations)
+        self.rating[openStations], self.failure[openStations] = self._stationParams(
+            sol.station_type[openStations], sol.land_cable[openStations]
+        )
+        self.partner, cables = sol.get_sub_cables()
+        self.linkRating = np.where(self.partner >= 0, inst.sub_cable_rating[cables], 0)
+
+        allStations = np.arange(nbStations)
+        params = (self.nbTurbines, self.rating, self.partner, self.linkRating)
+        self.curtailed = self._curtailed(allStations, *params[:2], inst.scenario_power)
+        self.curtailedTotal = self.curtailed.sum(axis=0)
+        self.extra = self._extra(allStations, *params, inst.scenario_power)
+        self.expCurtailed = self._expectedCurtailed(allStations, *params[:2])
+        self.expExtra = self._expectedExtra(allStations, *params)
+        self.peakCurtailed = self._curtailed(allStations, *params[:2], self.peakPower)[:, 0]
+        self.peakExtra = self._extra(allStations, *params, self.peakPower)[:, 0]
+
+        self.constructionCost = sol.construction_cost()
+        self.operationalCost = self._operationalCost(self.failure, self.curtailedTotal, self.extra)
+        self.nearestOpen = NearestOpenStations(inst, openStations)
+        if self.candidates is not None:
+            self.candidates.dontLook[:] = False
+        if self.keys is not None:
+            self.hash = self.keys.solutionHash(sol)
+        self._lastMove = None
+
+        return None
+
+    def _stationParams(self, stationTypes, cableTypes):
+        inst = self.instance
+        rating = np.minimum(inst.substation_rating[stationTypes], inst.land_cable_rating[cableTypes])
+        failure = inst.substation_failure[stationTypes] + inst.land_cable_failure[cableTypes]
+        return rating, failure
+
+    def _curtailed(self, stations, nbTurbines, rating, power):
+        load = nbTurbines[stations, None] * power[None, :]
+        return np.maximum(load - rating[stations, None], 0)
+
+    def _extra(self, stations, nbTurbines, rating, partner, linkRating, power):
+        return self._extraOf(*self._failureParams(stations, nbTurbines, rating, partner, linkRating), power)
+
+    def _failureParams(self, stations, nbTurbines, rating, partner, linkRating):
+        # Quantities the failure case of each of stations depends on
+        n, r = nbTurbines[stations], rating[stations]
+        other = partner[stations]
+        hasPartner = other >= 0
+        other = np.where(hasPartner, other, 0)
+        link = np.where(hasPartner, linkRating[stations], 0)
+        otherN = np.where(hasPartner, nbTurbines[other], 0)
+        otherR = np.where(hasPartner, rating[other], 0)
+        return n, r, hasPartner, link, otherN, otherR
+
+    def _extraOf(self, n, r, hasPartner, link, otherN, otherR, power):
+        return self.instance.failure_extra_curtailment(n, r, hasPartner, link, otherN, otherR, power)
+
+    def _expectedCurtailed(self, stations, nbTurbines, rating):
+        return self.instance.expected_curtailment(nbTurbines[stations], rating[stations])
+
+    def _expectedExtra(self, stations, nbTurbines, rating, partner, linkRating):
+        return self._expectedExtraOf(*self._failureParams(stations, nbTurbines, rating, partner, linkRating))
+
+    def _expectedExtraOf(self, n, r, hasPartner, link, otherN, otherR):
+        return self.instance.expected_failure_extra(n, r, hasPartner, link, otherN, otherR)
+
+    def _operationalCost(self, failure, curtailedTotal, extra):
+        inst = self.instance
+        noFailure = (1 - failure.sum()) * inst.curtailment_cost(curtailedTotal)
+        # Only open stations can fail
+        active = np.flatnonzero(failure)
+        withFailure = failure[active] @ inst.curtailment_cost(curtailedTotal[None, :] + extra[active])
+        return float(inst.scenario_probability @ (noFailure + withFailure))
+
+    def _change(self, move):
+        inst = self.instance
+        sol = self.sol
+        ch = Change()
+        constructionDiff = 0.0
+
+        nbTurbines = self.nbTurbines.copy()
+        rating = self.rating.copy()
+        failure = self.failure.copy()
+        partner = self.partner.copy()
+        linkRating = self.linkRating.copy()
+        changed = []
+
+        # Turbine reassignments
+        if len(move.turbines) > 0:
+            sources = sol.turbine_station[move.turbines]
+            np.add.at(nbTurbines, sources, -1)
+            np.add.at(nbTurbines, move.targets, 1)
+            constructionDiff += (
+                inst.turbine_cable_cost[move.turbines, move.targets].sum()
+                - inst.turbine_cable_cost[move.turbines, sources].sum()
+            )
+            changed.extend(sources)
+            changed.extend(move.targets)
+
+        # Station types and land cables
+        subCables = dict(move.subCables)
+        for s, (stationType, cableType) in move.stations.items():
+            oldType, oldCable = sol.station_type[s], sol.land_cable[s]
+            if oldType >= 0:
+                constructionDiff -= inst.substation_cost[oldType] + inst.land_cable_cost[s, oldCable]
+            if stationType >= 0:
+                constructionDiff += inst.substation_cost[stationType] + inst.land_cable_cost[s, cableType]
+                rating[s], failure[s] = self._stationParams(stationType, cableType)
+            else:
+                rating[s], failure[s] = 0, 0
+                # A closed station loses its substation cable
+                if partner[s] >= 0:
+                    subCables.setdefault((min(s, partner[s]), max(s, partner[s])), -1)
+            changed.append(s)
+
+        # Substation to substation cables
+        for (s1, s2), cableType in subCables.items():
+            if s1 == s2:
+                raise ValueError(f"Substation cable from station {s1} to itself")
+            oldCable = sol.sub_cables.get((s1, s2), -1)
+            if oldCable == cableType:
+                continue
+            if oldCable >= 0:
+                constructionDiff -= inst.sub_cable_cost[s1, s2, oldCable]
+            elif cableType >= 0:
+                # Each station has at most one substation cable
+                for s in (s1, s2):
+                    if partner[s] >= 0:
+                        o = partner[s]
+                        constructionDiff -= inst.sub_cable_cost[min(s, o), max(s, o), sol.sub_cables[(min(s, o), max(s, o))]]
+                        partner[o], linkRating[o] = -1, 0
+                        changed.append(o)
+            if cableType >= 0:
+                constructionDiff += inst.sub_cable_cost[s1, s2, cableType]
+                partner[s1], partner[s2] = s2, s1
+                linkRating[s1] = linkRating[s2] = inst.sub_cable_rating[cableType]
+            else:
+                partner[s1] = partner[s2] = -1
+                linkRating[s1] = linkRating[s2] = 0
+            changed.extend((s1, s2))
+
+        ch.stations = np.unique(np.asarray(changed, dtype=int))
+        # Failure cases involving a changed station or one of its partners
+        linked = np.concatenate((self.partner[ch.stations], partner[ch.stations]))
+        ch.rows = np.union1d(ch.stations, linked[linked >= 0])
+
+        ch.nbTurbines, ch.rating, ch.failure = nbTurbines, rating, failure
+        ch.partner, ch.linkRating = partner, linkRating
+        params = (nbTurbines, rating, partner, linkRating)
+        ch.expCurtailed = self._expectedCurtailed(ch.stations, *params[:2])
+        ch.expExtra = self._expectedExtra(ch.rows, *params)
+        ch.peakCurtailed = self._curtailed(ch.stations, *params[:2], self.peakPower)[:, 0]
+        ch.peakExtra = self._extra(ch.rows, *params, self.peakPower)[:, 0]
+        ch.constructionCost = self.constructionCost + constructionDiff
+
+        # Every curtailment grows with the power, so the penalty is inactive in all the scenarios
+        # as soon as it is inactive in the scenario of highest power
+        peakTotal = self.peakCurtailed.sum() + (ch.peakCurtailed - self.peakCurtailed[ch.stations]).sum()
+        peakExtra = self.peakExtra.copy()
+        peakExtra[ch.rows] = ch.peakExtra
+        active = failure > 0
+        peakFailure = peakTotal + peakExtra[active].max() if active.any() else peakTotal
+        if max(peakTotal, peakFailure) <= inst.maximum_curtailing:
+            expExtra = self.expExtra.copy()
+            expExtra[ch.rows] = ch.expExtra
+            expTotal = self.expCurtailed.sum() + (ch.expCurtailed - self.expCurtailed[ch.stations]).sum()
+            ch.operationalCost = float(inst.curtailing_cost * (expTotal + failure @ expExtra))
+        else:
+            self._scenarioRows(ch)
+            # Failure cases of rows are first counted with their previous extra curtailment
+            ch.operationalCost = (
+                self._operationalCost(failure, ch.curtailedTotal, self.extra)
+                + self._failureCost(failure[ch.rows], ch.curtailedTotal, ch.extra)
+                - self._failureCost(failure[ch.rows], ch.curtailedTotal, self.extra[ch.rows])
+            )
+
+        return ch
+
+    def _scenarioRows(self, ch):
+        power = self.instance.scenario_power
+        ch.curtailed = self._curtailed(ch.stations, ch.nbTurbines, ch.rating, power)
+        ch.curtailedTotal = self.curtailedTotal + (ch.curtailed - self.curtailed[ch.stations]).sum(axis=0)
+        ch.extra = self._extra(ch.rows, ch.nbTurbines, ch.rating, ch.partner, ch.linkRating, power)
+
+        return None
+
+    def _failureCost(self, failure, curtailedTotal, extra):
+        inst = self.instance
+        withFailure = failure @ inst.curtailment_cost(curtailedTotal[None, :] + extra)
+        return float(inst.scenario_probability @ withFailure)
+
+    def relocationDeltas(self, turbines=None):
+        # Objective change of moving each of turbines (all by default) to each open station, in one pass
+        # Exact unless the move changes the curtailment with no failure while the penalty is active,
+        # the penalty on that change is then ignored
+        # Returns the open stations and the [turbines, open stations] matrix, inf where nothing moves
+        inst = self.instance
+        sol = self.sol
+        turbines = np.arange(inst.get_nb_turbines()) if turbines is None else np.asarray(turbines, dtype=int)
+        openStations = np.flatnonzero(sol.station_type >= 0)
+        sources = sol.turbine_station[turbines]
+        nbStations = inst.get_nb_stations()
+
+        # A relocation only changes the failure cases of its two stations and of their partners
+        # Variants (turbines of s, turbines of its partner): (-1, 0), (+1, 0), (0, -1), (0, +1), (-1, +1), (+1, -1)
+        n, r, hasPartner, link, otherN, otherR = self._failureParams(
+            np.arange(nbStations), self.nbTurbines, self.rating, self.partner, self.linkRating
+        )
+        dn = np.array([[-1, 0], [1, 0], [0, -1], [0, 1], [-1, 1], [1, -1]])
+        variants = (
+            np.maximum(np.add.outer(dn[:, 0], n), 0).ravel(),
+            np.tile(r, len(dn)),
+            np.tile(hasPartner, len(dn)),
+            np.tile(link, len(dn)),
+            np.maximum(np.add.outer(dn[:, 1], otherN), 0).ravel(),
+            np.tile(otherR, len(dn)),
+        )
+        extra = self._extraOf(*variants, inst.scenario_power).reshape(len(dn), nbStations, -1)
+        withFailure = inst.curtailment_cost(self.curtailedTotal + extra) - inst.curtailment_cost(self.curtailedTotal + self.extra)
+        failureCost = self.failure * (withFailure @ inst.scenario_probability)
+        curtailed = inst.expected_curtailment(variants[0][: 2 * nbStations], variants[1][: 2 * nbStations]).reshape(2, -1)
+        curtailedCost = inst.curtailing_cost * (curtailed - self.expCurtailed)
+        partner = np.where(hasPartner, self.partner, 0)
+        partnerCost = np.where(hasPartner, failureCost[:, partner], 0)
+
+        # Station losing a turbine, station gaining one, and a cable between the two
+        leaving = curtailedCost[0] + failureCost[0] + partnerCost[2]
+        arriving = curtailedCost[1] + failureCost[1] + partnerCost[3]
+        operational = leaving[sources][:, None] + arriving[openStations][None, :]
+        rows, cols = np.nonzero(self.partner[sources][:, None] == openStations[None, :])
+        a, b = sources[rows], openStations[cols]
+        operational[rows, cols] = curtailedCost[0, a] + curtailedCost[1, b] + failureCost[4, a] + failureCost[5, b]
+
+        construction = inst.turbine_cable_cost[np.ix_(turbines, openStations)] - inst.turbine_cable_cost[turbines, sources][:, None]
+        deltas = construction + operational
+        deltas[sources[:, None] == openStations[None, :]] = np.inf
+        return openStations, deltas
+
+    def linkDeltas(self, stations=None):
+        # Objective change of linking each pair of stations (open ones by default) by each candidate
+        # substation cable type, and of removing the substation cable of each station
+        # A substation cable only matters when one of its ends fails, so the curtailment with no failure
+        # does not change and the values are exact
+        # Returns the stations, the cable types, the [s1, s2, cable] and the [s] matrices, inf where nothing changes
+        inst = self.instance
+        sol = self.sol
+        stations = np.flatnonzero(sol.station_type >= 0) if stations is None else np.asarray(stations, dtype=int)
+        cables = inst.sub_cable_candidates
+        power, probability = inst.scenario_power, inst.scenario_probability
+        nbStations, nb = inst.get_nb_stations(), len(stations)
+
+        def failureCost(extra):
+            return inst.curtailment_cost(self.curtailedTotal + extra) @ probability
+
+        # Redundancy benefit: change of the cost of the failure case of s1 once linked to s2 by each cable type
+        current = failureCost(self.extra)
+        n, r = self.nbTurbines, self.rating
+        benefit = np.empty((nb, nb, len(cables)))
+        # Blocks of rows keep the [pairs, scenarios] temporaries small
+        blockSize = max(1, 2**21 // max(1, nb * len(power)))
+        for k, c in enumerate(cables):
+            for start in range(0, nb, blockSize):
+                rows = stations[start : start + blockSize]
+                shape = (len(rows), nb)
+                extra = self._extraOf(
+                    np.broadcast_to(n[rows, None], shape).ravel(),
+                    np.broadcast_to(r[rows, None], shape).ravel(),
+                    np.ones(np.prod(shape), dtype=bool),
+                    np.full(np.prod(shape), inst.sub_cable_rating[c]),
+                    np.broadcast_to(n[stations][None, :], shape).ravel(),
+                    np.broadcast_to(r[stations][None, :], shape).ravel(),
+                    power,
+                )
+                benefit[start : start + len(rows), :, k] = (failureCost(extra).reshape(shape) - current[rows, None]) * self.failure[rows, None]
+
+        # Change of the failure case of each station when it loses its cable
+        noLink = np.zeros(nbStations)
+        alone = self._extraOf(n, r, noLink > 0, noLink, noLink, noLink, power)
+        unlink = self.failure * (failureCost(alone) - current)
+        partner, cable = sol.get_sub_cables()
+        cableCost = np.where(partner >= 0, inst.sub_cable_cost[np.arange(nbStations), partner, cable], 0)
+        # Removing the cables of s and its partner, none if s is not linked
+        unlinkPartner = np.where(partner >= 0, unlink[partner], 0)
+
+        p = partner[stations]
+        freed = -cableCost[stations] + unlinkPartner[stations]
+        deltas = (
+            inst.sub_cable_cost[np.ix_(stations, stations, cables)]
+            + benefit
+            + benefit.transpose(1, 0, 2)
+            + (freed[:, None] + freed[None, :])[:, :, None]
+        )
+        # Already linked together: only the cable type changes
+        rows, cols = np.nonzero(p[:, None] == stations[None, :])
+        deltas[rows, cols] = (
+            inst.sub_cable_cost[stations[rows], stations[cols]][:, cables]
+            - cableCost[stations[rows]][:, None]
+            + benefit[rows, cols]
+            + benefit[cols, rows]
+        )
+        same = np.flatnonzero(np.isin(cable[stations[rows]], cables))
+        deltas[rows[same], cols[same], np.searchsorted(cables, cable[stations[rows[same]]])] = np.inf
+        deltas[np.arange(nb), np.arange(nb)] = np.inf
+        removal = np.where(p >= 0, -cableCost[stations] + unlink[stations] + unlinkPartner[stations], np.inf)
+        return stations, cables, deltas, removal
+
+    def _hashAfter(self, move):
+        # Hash of the solution once move is applied, cables removed as a side effect included
+        keys = self.keys
+        sol = self.sol
+        h = self.hash
+        if len(move.turbines) > 8:
+            h ^= keys.turbines(move.turbines, sol.turbine_station[move.turbines]) ^ keys.turbines(move.turbines, move.targets)
+        else:
+            for t, target in zip(move.turbines.tolist(), move.targets.tolist()):
+                h ^= keys.turbine(t, sol.turbine_station[t]) ^ keys.turbine(t, target)
+
+        subCables = dict(move.subCables)
+        for s, (stationType, cableType) in move.stations.items():
+            h ^= keys.stationType(s, sol.station_type[s]) ^ keys.stationType(s, stationType)
+            h ^= keys.landCable(s, sol.land_cable[s]) ^ keys.landCable(s, cableType)
+            if stationType < 0 and self.partner[s] >= 0:
+                subCables.setdefault((min(s, self.partner[s]), max(s, self.partner[s])), -1)
+
+        removed = set()
+        for (s1, s2), cableType in subCables.items():
+            if s1 == s2:
+                raise ValueError(f"Substation cable from station {s1} to itself")
+            oldCable = sol.sub_cables.get((s1, s2), -1)
+            if oldCable == cableType:
+                continue
+            if oldCable >= 0:
+                h ^= keys.link(s1, s2, oldCable)
+                removed.add((s1, s2))
+            elif cableType >= 0:
+                for s in (s1, s2):
+                    o = self.partner[s]
+                    pair = (min(s, o), max(s, o))
+                    if o >= 0 and pair not in removed:
+                        h ^= keys.link(*pair, sol.sub_cables[pair])
+                        removed.add(pair)
+            if cableType >= 0:
+                h ^= keys.link(s1, s2, cableType)
+
+        return h
+
+    def delta(self, move):
+        # Objective change if move is applied, the state is left untouched
+        h = None
+        self.lastDeltaCached = self.lastDeltaTabu = False
+        if self.keys is not None:
+            h = self._hashAfter(move)
+            if self.tabu is not None and h in self.tabu:
+                self.lastDeltaTabu = True
+                return np.inf
+            if self.costCache is not None:
+                cost = self.costCache.get(h)
+                if cost is not None:
+                    self.lastDeltaCached = True
+                    return cost - self.cost
+
+        ch = self._change(move)
+        self._lastMove, self._lastChange, self._lastHash = move, ch, h
+        if self.costCache is not None:
+            self.costCache.put(h, ch.constructionCost + ch.operationalCost)
+        return ch.constructionCost + ch.operationalCost - self.cost
+
+    def apply(self, move):
+        ch = self._lastChange if move is self._lastMove else self._change(move)
+        if self.keys is not None:
+            h = self._lastHash if move is self._lastMove else self._hashAfter(move)
+        sol = self.sol
+
+        if len(move.turbines) > 0:
+            sol.turbine_station[move.turbines] = move.targets
+        for s, (stationType, cableType) in move.stations.items():
+            if stationType >= 0 and sol.station_type[s] < 0:
+                self.nearestOpen.open(s)
+            elif stationType < 0 and sol.station_type[s] >= 0:
+                self.nearestOpen.close(s)
+            sol.station_type[s], sol.land_cable[s] = stationType, cableType
+        for s in ch.stations:
+            o = self.partner[s]
+            if o >= 0 and ch.partner[s] != o:
+                sol.sub_cables.pop((min(s, o), max(s, o)), None)
+        for (s1, s2), cableType in move.subCables.items():
+            if cableType >= 0:
+                sol.sub_cables[(s1, s2)] = cableType
+
+        if ch.curtailed is None:
+            self._scenarioRows(ch)
+        self.nbTurbines, self.rating, self.failure = ch.nbTurbines, ch.rating, ch.failure
+        self.partner, self.linkRating = ch.partner, ch.linkRating
+        self.curtailed[ch.stations] = ch.curtailed
+        self.curtailedTotal = ch.curtailedTotal
+        self.extra[ch.rows] = ch.extra
+        self.expCurtailed[ch.stations] = ch.expCurtailed
+        self.expExtra[ch.rows] = ch.expExtra
+        self.peakCurtailed[ch.stations] = ch.peakCurtailed
+        self.peakExtra[ch.rows] = ch.peakExtra
+        self.constructionCost = ch.constructionCost
+        self.operationalCost = ch.operationalCost
+        if self.candidates is not None:
+            self.candidates.wake(ch.rows, sol.turbine_station)
+        if self.keys is not None:
+            self.hash = h
+            if self.tabu is not None:
+                self.tabu.add(h)
+        self._lastMove = None
+
+        return None
@@ -0,0 +1,185 @@
+import argparse
+import json
+import math
+import os
+
+import numpy as np
+
+from benchmark import runBenchmark
+
+# Records formatted and written at once
+chunkSize = 10000
+# Turbines per cluster, spacing of the turbines of a cluster
+clusterSize = 125
+turbineSpacing = 0.5
+# Power of a turbine, and wind speeds of its power curve: cut-in, rated, cut-out
+maximumPower = 18.0
+cutIn, rated, cutOut = 3.0, 12.0, 25.0
+
+
+def _writeRecords(f, records):
+    # Records of a JSON list, continuing the list when something was already written
+    first = True
+    for chunk in records:
+        if len(chunk) == 0:
+            continue
+        f.write(("" if first else ", ") + ", ".join(chunk))
+        first = False
+
+
+def _scenarioChunks(rng, nbScenarios):
+    # Monte Carlo wind scenarios: Weibull wind speeds through the power curve, equally likely
+    for start in range(0, nbScenarios, chunkSize):
+        ids = range(start + 1, min(start + chunkSize, nbScenarios) + 1)
+        speed = 9.0 * rng.weibull(2.0, len(ids))
+        power = maximumPower * np.clip((speed**3 - cutIn**3) / (rated**3 - cutIn**3), 0, 1) * (speed < cutOut)
+        yield [f'{{"id": {i}, "power_generation": {p:.4f}, "probability": {1 / nbScenarios!r}}}' for i, p in zip(ids, power)]
+
+
+def _clusters(rng, nbTurbines, nbClusters):
+    # Centers offshore, away from the land station at (0, 0), and number of turbines of each cluster
+    spread = math.sqrt(nbClusters)
+    centers = np.column_stack((rng.uniform(60, 60 + 20 * spread, nbClusters), rng.uniform(-10 * spread, 10 * spread, nbClusters)))
+    sizes = 1 + rng.multinomial(nbTurbines - nbClusters, np.full(nbClusters, 1 / nbClusters))
+    return centers, sizes
+
+
+def _turbineChunks(rng, centers, sizes):
+    # Each cluster is a jittered grid of turbines around its center
+    nextId = 1
+    for center, size in zip(centers, sizes):
+        side = math.ceil(math.sqrt(size))
+        cells = np.arange(size)
+        coords = center + turbineSpacing * (np.column_stack((cells % side, cells // side)) - (side - 1) / 2)
+        coords += rng.normal(0, turbineSpacing / 10, coords.shape)
+        yield [f'{{"id": {nextId + i}, "x": {x:.3f}, "y": {y:.3f}}}' for i, (x, y) in enumerate(coords)]
+        nextId += size
+
+
+def _siteChunks(rng, centers, sizes, nbSites):
+    # Sites on the way from the land station to the clusters, more of them for the larger clusters
+    clusterOfSite = rng.choice(len(centers), nbSites, p=sizes / sizes.sum())
+    for start in range(0, nbSites, chunkSize):
+        clusters = clusterOfSite[start:start + chunkSize]
+        along = rng.uniform(0.3, 0.95, len(clusters))[:, None]
+        coords = along * centers[clusters] + rng.normal(0, 5, (len(clusters), 2))
+        yield [f'{{"id": {start + i + 1}, "x": {x:.2f}, "y": {y:.2f}}}' for i, (x, y) in enumerate(coords)]
+
+
+def _ratings(nbTypes, maxRating):
+    # nbTypes types on up to 6 rating levels, each level in several reliability grades
+    nbLevels = min(6, nbTypes)
+    levels = np.round(np.geomspace(200, max(maxRating, 300), nbLevels), -1)
+    return levels[np.arange(nbTypes) % nbLevels], np.arange(nbTypes) // nbLevels
+
+
+def _typeRecords(nbTypes, maxRating):
+    rating, grade = _ratings(nbTypes, maxRating)
+    # Less reliable grades are cheaper
+    cost = 1.2 * rating * 0.9**grade
+    failure = 1.37e-5 * 4.0**grade
+    return [
+        f'{{"id": {i + 1}, "rating": {r:g}, "cost": {c:.2f}, "probability_of_failure": {float(p)!r}}}'
+        for i, (r, c, p) in enumerate(zip(rating, cost, failure))
+    ]
+
+
+def _cableRecords(nbTypes, maxRating, withFailure):
+    rating, grade = _ratings(nbTypes, maxRating)
+    variableCost = 6.0 * (rating / 200) ** 0.37 * 0.9**grade
+    fixedCost = 120.0 * 0.9**grade
+    failure = 2.74e-4 * 2.0**grade
+    return [
+        f'{{"id": {i + 1}, "rating": {r:g}, "variable_cost": {v:.3f}, "fixed_cost": {c:.2f}'
+        + (f', "probability_of_failure": {float(p)!r}}}' if withFailure else "}")
+        for i, (r, v, c, p) in enumerate(zip(rating, variableCost, fixedCost, failure))
+    ]
+
+
+def writeInstance(path, nbTurbines, nbSites, nbScenarios=1000, nbTypes=28, nbCableTypes=None, nbClusters=None, seed=0):
+    # Random instance in the JSON format read by Instance, written record chunk by record chunk
+    rng = np.random.default_rng(seed)
+    nbCableTypes = nbCableTypes or nbTypes
+    nbClusters = min(nbClusters or max(1, round(nbTurbines / clusterSize)), nbTurbines)
+    centers, sizes = _clusters(rng, nbTurbines, nbClusters)
+    # The largest types carry a cluster
+    maxRating = maximumPower * sizes.max()
+    general = {
+        "fixed_cost_cable": 5.0,
+        "variable_cost_cable": 0.5,
+        "curtailing_penalty": 8750.0,
+        "curtailing_cost": 87.5,
+        "main_land_station": {"x": 0, "y": 0},
+        "maximum_power": maximumPower,
+        "maximum_curtailing": 6.0 * nbTurbines,
+    }
+
+    with open(path, "w") as f:
+        f.write(f'{{"general_parameters": {json.dumps(general)},\n"wind_scenarios": [')
+        _writeRecords(f, _scenarioChunks(rng, nbScenarios))
+        f.write('],\n"wind_turbines": [')
+        _writeRecords(f, _turbineChunks(rng, centers, sizes))
+        f.write('],\n"substation_locations": [')
+        _writeRecords(f, _siteChunks(rng, centers, sizes, nbSites))
+        f.write('],\n"substation_types": [')
+        _writeRecords(f, [_typeRecords(nbTypes, maxRating)])
+        f.write('],\n"land_substation_cable_types": [')
+        _writeRecords(f, [_cableRecords(nbCableTypes, maxRating, True)])
+        f.write('],\n"substation_substation_cable_types": [')
+        _writeRecords(f, [_cableRecords(nbCableTypes, maxRating, False)])
+        f.write("]}\n")
+
+
+def scalingReport(sizes, outputDir, nbScenarios=1000, nbTypes=28, timeLimit=10.0, seed=0):
+    # Load time, peak memory and iterations per second of the local search on generated instances of growing size
+    # sizes: (nbTurbines, nbSites) pairs
+    os.makedirs(outputDir, exist_ok=True)
+    paths = []
+    for nbTurbines, nbSites in sizes:
+        path = os.path.join(outputDir, f"synthetic_{nbTurbines}_{nbSites}.json")
+        writeInstance(path, nbTurbines, nbSites, nbScenarios, nbTypes, seed=seed)
+        paths.append(path)
+    results = runBenchmark(paths, [seed], timeLimit)
+
+    print(f"{'turbines':>9} {'sites':>6} {'file MB':>8} {'load s':>8} {'cached s':>9} {'peak MB':>8} {'it/s':>9}")
+    for (nbTurbines, nbSites), path, run in zip(sizes, paths, results["runs"]):
+        run["nb_turbines"], run["nb_sites"], run["nb_scenarios"] = nbTurbines, nbSites, nbScenarios
+        run["file_size"] = os.path.getsize(path)
+        run["iterations_per_sec"] = run["iterations"] / run["elapsed"]
+        print(
+            f"{nbTurbines:>9} {nbSites:>6} {run['file_size'] / 2**20:>8.1f} {run['load_time']:>8.2f} "
+            f"{run['load_time_cached']:>9.2f} {run['peak_memory_kb'] / 1024:>8.0f} {run['iterations_per_sec']:>9.1f}"
+        )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic instances, or report how the solver scales with their size")
+    parser.add_argument("output", help="instance file, or directory of the instances with --scaling")
+    parser.add_argument("--turbines", type=int, default=10000)
+    parser.add_argument("--sites", type=int, default=1000)
+    parser.add_argument("--scenarios", type=int, default=5000)
+    parser.add_argument("--types", type=int, default=28, help="substation types, and cable types unless --cable-types")
+    parser.add_argument("--cable-types", type=int)
+    parser.add_argument("--clusters", type=int, help="turbine clusters, one per 125 turbines by default")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--scaling", type=int, nargs="+", metavar="TURBINES",
+        help="report on instances of these numbers of turbines, with sites in the ratio of --turbines and --sites",
+    )
+    parser.add_argument("--time", type=float, default=10.0, help="time budget per scaling run, in seconds")
+    parser.add_argument("--report", default="scaling_report.json")
+    args = parser.parse_args()
+
+    if args.scaling:
+        sizes = [(n, max(2, round(n * args.sites / args.turbines))) for n in args.scaling]
+        results = scalingReport(sizes, args.output, args.scenarios, args.types, args.time, args.seed)
+        with open(os.path.join(args.output, args.report), "w") as f:
+            json.dump(results, f, indent=1)
+        print(f"Report written to {os.path.join(args.output, args.report)}")
+    else:
+        writeInstance(args.output, args.turbines, args.sites, args.scenarios, args.types, args.cable_types, args.clusters, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+from collections import OrderedDict, deque
+
+import numpy as np
+
+
+MASK = (1 << 64) - 1
+
+
+def mix64(x):
+    # splitmix64 finalizer of a uint64 array, wrapping arithmetic
+    x = np.asarray(x, dtype=np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def mixInt(x):
+    # Same as mix64 on a Python int, much faster for a single key
+    x = (x + 0x9E3779B97F4A7C15) & MASK
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASK
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASK
+    return x ^ (x >> 31)
+
+
+class ZobristKeys:
+    # 64-bit key of every (turbine, station), (station, type), (station, land cable) and (station, station, cable)
+    # choice, hashed from its index rather than stored; the hash of a solution is the xor of the keys of its choices
+    def __init__(self, instance, seed=0) -> None:
+        self.nbStations = instance.get_nb_stations()
+        # Index 0 of types and cables stands for none
+        self.nbTypes = len(instance.substation_cost) + 1
+        self.nbLandCables = len(instance.land_cable_rating) + 1
+        self.nbSubCables = len(instance.sub_cable_rating)
+        self.seeds = [mixInt(seed * 4 + kind) for kind in range(4)]
+
+        return None
+
+    def turbines(self, turbines, stations):
+        # xor of the keys of many turbine choices
+        keys = mix64(np.uint64(self.seeds[0]) ^ (np.asarray(turbines, dtype=np.uint64) * np.uint64(self.nbStations) + np.asarray(stations, dtype=np.uint64)))
+        return int(np.bitwise_xor.reduce(keys, initial=np.uint64(0)))
+
+    def turbine(self, turbine, station):
+        return mixInt(self.seeds[0] ^ (int(turbine) * self.nbStations + int(station)))
+
+    def stationType(self, station, stationType):
+        return mixInt(self.seeds[1] ^ (int(station) * self.nbTypes + int(stationType) + 1))
+
+    def landCable(self, station, cableType):
+        return mixInt(self.seeds[2] ^ (int(station) * self.nbLandCables + int(cableType) + 1))
+
+    def link(self, s1, s2, cableType):
+        return mixInt(self.seeds[3] ^ ((int(s1) * self.nbStations + int(s2)) * self.nbSubCables + int(cableType)))
+
+    def solutionHash(self, sol):
+        linked = np.flatnonzero(sol.turbine_station >= 0)
+        h = self.turbines(linked, sol.turbine_station[linked])
+        for s, (stationType, cableType) in enumerate(zip(sol.station_type.tolist(), sol.land_cable.tolist())):
+            h ^= self.stationType(s, stationType) ^ self.landCable(s, cableType)
+        for (s1, s2), cableType in sol.sub_cables.items():
+            h ^= self.link(s1, s2, cableType)
+        return h
+
+
+class CostCache:
+    # Bounded least recently used map from solution hash to cost
+    def __init__(self, maxSize) -> None:
+        self.maxSize = maxSize
+        self.costs = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+        return None
+
+    def get(self, key):
+        cost = self.costs.get(key)
+        if cost is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.costs.move_to_end(key)
+        return cost
+
+    def put(self, key, cost):
+        self.costs[key] = cost
+        self.costs.move_to_end(key)
+        if len(self.costs) > self.maxSize:
+            self.costs.popitem(last=False)
+
+
+class TabuList:
+    # Hashes of the last tenure visited solutions
+    def __init__(self, tenure) -> None:
+        self.tenure = tenure
+        self.order = deque()
+        self.members = {}
+
+        return None
+
+    def __contains__(self, key):
+        return key in self.members
+
+    def add(self, key):
+        self.order.append(key)
+        self.members[key] = self.members.get(key, 0) + 1
+        if len(self.order) > self.tenure:
+            old = self.order.popleft()
+            self.members[old] -= 1
+            if self.members[old] == 0:
+                del self.members[old]
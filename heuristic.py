@@ -0,0 +1,45 @@
+import numpy as np
+from classes import Solution
+from spatialIndex import NearestOpenStations
+
+
+def dropHeuristic(instance):
+    # All the stations open, turbines on their nearest open station; close the station whose closing saves
+    # the most while one does
+    nbTurbines, nbStations = instance.get_nb_turbines(), instance.get_nb_stations()
+    cost, stationType, landCable = instance.cheapest_station_configs()
+    allStations, allTurbines = np.arange(nbStations), np.arange(nbTurbines)
+    openStations = np.ones(nbStations, dtype=bool)
+    index = NearestOpenStations(instance, openStations)
+
+    while openStations.sum() > 1:
+        nearest, second = index.nearest, index.second
+        counts = np.bincount(nearest, minlength=nbStations)
+
+        # Closing s sends its turbines to their second nearest station
+        cableDiff = np.bincount(
+            nearest,
+            weights=instance.turbine_cable_cost[allTurbines, second] - instance.turbine_cable_cost[allTurbines, nearest],
+            minlength=nbStations,
+        )
+        # Number of turbines moved from each station to each other one, only for the pairs that occur
+        pairs, moved = np.unique(nearest * nbStations + second, return_counts=True)
+        source, target = np.divmod(pairs, nbStations)
+        stationDiff = cost[target, counts[target] + moved] - cost[target, counts[target]]
+        closing = cableDiff - cost[allStations, counts] + np.bincount(source, weights=stationDiff, minlength=nbStations)
+        closing[~openStations] = np.inf
+
+        s = np.argmin(closing)
+        if closing[s] >= 0:
+            break
+        openStations[s] = False
+        index.close(s)
+
+    turbineStation = index.nearest
+    counts = np.bincount(turbineStation, minlength=nbStations)
+    return Solution(
+        instance,
+        turbineStation,
+        np.where(openStations, stationType[allStations, counts], -1),
+        np.where(openStations, landCable[allStations, counts], -1),
+    )
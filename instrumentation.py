@@ -0,0 +1,139 @@
+import json
+import time
+
+
+class Tracer:
+    # Opt-in instrumentation of a local search: pass one to mainLSinst, nothing is timed otherwise
+    calls: dict # voisType -> number of calls
+    accepted: dict # voisType -> number of improving moves
+    time: dict # voisType -> seconds spent in the neighborhood
+    evalTime: dict # voisType -> seconds spent in the evaluator (delta and apply)
+    evalCalls: dict # voisType -> number of evaluator calls
+    improvement: dict # voisType -> total objective decrease
+    history: list # (seconds since start, cost) each time the best cost improves
+    bound: float # lower bound computed by the search with a target gap, None if none
+
+    def __init__(self, tracePath=None, traceIterations=False) -> None:
+        # tracePath: JSONL file receiving one event per improvement (per iteration with traceIterations)
+        self.calls = {}
+        self.accepted = {}
+        self.time = {}
+        self.evalTime = {}
+        self.evalCalls = {}
+        self.improvement = {}
+        self.history = []
+        self.counters = {}
+        self.bound = None
+        self.start = time.perf_counter()
+        self.traceIterations = traceIterations
+        self.traceFile = None if tracePath is None else open(tracePath, "w")
+
+        self._evalTime = 0.0
+        self._evalCalls = 0
+        self._iterStart = 0.0
+        self._iterEval = 0.0
+        self._iterEvalCalls = 0
+        self._cost = None
+
+        return None
+
+    def attach(self, evaluator):
+        # Time the evaluator calls of this search
+        delta, apply = evaluator.delta, evaluator.apply
+
+        def timedDelta(move):
+            start = time.perf_counter()
+            try:
+                return delta(move)
+            finally:
+                self._evalTime += time.perf_counter() - start
+                self._evalCalls += 1
+                if evaluator.costCache is not None:
+                    self.count("cache_hits" if evaluator.lastDeltaCached else "cache_misses")
+                if evaluator.lastDeltaTabu:
+                    self.count("tabu_rejections")
+
+        def timedApply(move):
+            start = time.perf_counter()
+            try:
+                return apply(move)
+            finally:
+                self._evalTime += time.perf_counter() - start
+
+        evaluator.delta, evaluator.apply = timedDelta, timedApply
+        self._cost = evaluator.cost
+        self.recordCost(evaluator.cost)
+
+    def startIteration(self):
+        self._iterStart = time.perf_counter()
+        self._iterEval = self._evalTime
+        self._iterEvalCalls = self._evalCalls
+
+    def endIteration(self, voisType, success, cost):
+        duration = time.perf_counter() - self._iterStart
+        improvement = self._cost - cost
+        self._cost = cost
+        self.calls[voisType] = self.calls.get(voisType, 0) + 1
+        self.accepted[voisType] = self.accepted.get(voisType, 0) + int(success)
+        self.time[voisType] = self.time.get(voisType, 0) + duration
+        self.evalTime[voisType] = self.evalTime.get(voisType, 0) + self._evalTime - self._iterEval
+        self.evalCalls[voisType] = self.evalCalls.get(voisType, 0) + self._evalCalls - self._iterEvalCalls
+        self.improvement[voisType] = self.improvement.get(voisType, 0) + improvement
+        if success:
+            self.recordCost(cost)
+        if self.traceFile is not None and (success or self.traceIterations):
+            self.event("iteration", voisType=voisType, success=bool(success), duration=duration, cost=cost, improvement=improvement)
+
+    def recordCost(self, cost):
+        if not self.history or cost < self.history[-1][1]:
+            self.history.append((time.perf_counter() - self.start, cost))
+
+    def count(self, name, value=1):
+        # Free-form counters (cache hits, restarts...)
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def event(self, kind, **fields):
+        if self.traceFile is not None:
+            fields = {"event": kind, "time": time.perf_counter() - self.start, **fields}
+            self.traceFile.write(json.dumps(fields) + "\n")
+
+    def neighborhoodStats(self):
+        stats = {}
+        for voisType in sorted(self.calls):
+            calls, spent = self.calls[voisType], self.time[voisType]
+            stats[str(voisType)] = {
+                "calls": calls,
+                "accepted": self.accepted[voisType],
+                "acceptance_rate": self.accepted[voisType] / calls,
+                "time": spent,
+                "iterations_per_sec": calls / spent if spent > 0 else None,
+                "mean_eval_time": self.evalTime[voisType] / self.evalCalls[voisType] if self.evalCalls[voisType] else None,
+                "eval_share": self.evalTime[voisType] / spent if spent > 0 else None,
+                "improvement": self.improvement[voisType],
+            }
+        return stats
+
+    def summary(self):
+        lines = [
+            f"{'vois':>4} {'calls':>9} {'accepted':>9} {'rate':>7} {'it/s':>10} {'eval us':>9} {'eval %':>7} {'improvement':>13} {'impr/ms':>10}"
+        ]
+        for voisType, s in self.neighborhoodStats().items():
+            meanEval = s["mean_eval_time"] * 1e6 if s["mean_eval_time"] is not None else 0
+            perMs = s["improvement"] / (s["time"] * 1000) if s["time"] > 0 else 0
+            lines.append(
+                f"{voisType:>4} {s['calls']:>9} {s['accepted']:>9} {s['acceptance_rate']:>7.1%} "
+                f"{s['iterations_per_sec'] or 0:>10.1f} {meanEval:>9.1f} {s['eval_share'] or 0:>7.1%} "
+                f"{s['improvement']:>13.2f} {perMs:>10.3f}"
+            )
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"{name}: {value}")
+        lookups = self.counters.get("cache_hits", 0) + self.counters.get("cache_misses", 0)
+        if lookups:
+            lines.append(f"cache hit rate: {self.counters.get('cache_hits', 0) / lookups:.1%}")
+        return "\n".join(lines)
+
+    def close(self):
+        if self.traceFile is not None:
+            self.event("summary", neighborhoods=self.neighborhoodStats(), counters=self.counters)
+            self.traceFile.close()
+            self.traceFile = None
@@ -1,323 +1,382 @@
 import random as rd
+import time
 import numpy as np
+import scheduler
+from scheduler import eps
 from classes import Instance, Solution
-from copy import deepcopy
+from heuristic import dropHeuristic
+from spatialIndex import NearestOpenStations
+from evaluator import IncrementalEvaluator, Move, RelocateTurbine, ChangeStationType, ChangeLandCable, OpenStation, CloseStation, SetSubCable
 
 nbRandomSols = 1
+# Iterations of a search without time limit, and iterations without improving its best solution after which a search stops
 nbMaxIters = 5000
+nbStallIters = 2000
+# Acceptance criterion of the moves: "descent", "annealing" or "late" (see scheduler.criteria)
+acceptance = "descent"
+# Gap to the lower bound of bounding.lowerBound at which the search stops, None to never compute the bound
+targetGap = None
+# Largest part of the time budget spent on the lower bound, the searches run without target if it is not solved by then
+boundShare = 0.2
+# The first start is the constructive heuristic rather than a random solution
+heuristicStart = True
+# Number of nearest sites the neighborhoods consider for each turbine, None for all of them
+granularSize = None
+# Entries of the cache of evaluated solution costs, None to disable it
+costCacheSize = 10**5
+# Number of last visited solutions the search may not come back to, None to disable the tabu list
+tabuTenure = None
+# Batch relocation applies a set of non-conflicting moves rather than only the best one
+batchNonConflicting = True
+verbose = True
 
-class SolutionComplement:
-    openStations: np.ndarray # [s] if station is open
-    powerReceived: np.ndarray # [s, scen] is the power received by station s in scenario scen
-    lossesInStat: np.ndarray # [s, scen] is the power loss at station s in scenario scen
-    powerInStat: np.ndarray # [s, scen] is the power at station s in scenario scen
-    lossesInStatCable: np.ndarray # [s, scen] is the power loss in cable between station s and on shore in scenario scen
-    ### TAKE CARE OF FAILURES IN POWER RECEIVED
-    lossesInStatStatCable: np.ndarray # [s1, s2, scen] is the power loss in cable between s1 and s2 in scenario scen in case of failure of s1
-
-    def __init__(self, inst, sol) -> None:
-        self.openStations = np.zeros((len(inst.stations)), dtype=int)
-        self.powerReceived = np.zeros((len(inst.stations), len(inst.scenarios)), dtype=int)
-        self.lossesInStat = np.zeros((len(inst.stations), len(inst.scenarios)), dtype=int)
-        self.powerInStat = np.zeros((len(inst.stations), len(inst.scenarios)), dtype=int)
-        self.lossesInStatCable = np.zeros((len(inst.stations), len(inst.scenarios)), dtype=int)
-        self.lossesInStatStatCable = np.zeros((len(inst.stations), len(inst.stations), len(inst.scenarios)), dtype=int)
-        for s in range(len(inst.stations)):
-            stationType = np.argmax(sol.x[s, :]) if np.any(sol.x[s, :] == 1) else -1
-            cableType = np.argmax(sol.y_off_on[s, :]) if np.any(sol.y_off_on[s, :] == 1) else -1
-            if stationType == -1:
-                continue
-            self.openStations[s] = 1
-            capacityStat = inst.substation_types[stationType].rating
-            capacityCable = inst.land_to_sub_cables[cableType].rating
-            for scen in range(len(inst.scenarios)):
-                nbTurbines = sol.z[:, s].sum()
-                self.powerReceived[s, scen] = nbTurbines * inst.scenarios[scen].power_generation
-                self.powerInStat[s, scen] = min(self.powerReceived[s, scen], capacityStat)
-                self.lossesInStat[s, scen] = self.powerReceived[s, scen] - self.powerInStat[s, scen]
-                self.lossesInStatCable[s, scen] = max(self.powerInStat[s, scen] - capacityCable, 0)
-        return None
+def improves(delta):
+    # Default acceptance of the neighborhoods: strict improvement
+    return delta < -eps
 
 def getRandomSol(inst):
     randomStations = []
-    for i in range(len(inst.stations)):
+    for i in range(inst.get_nb_stations()):
         if (rd.randint(0, 1) == 0):
             randomStations.append(i)
     if len(randomStations) == 0:
         randomStations = [0]
 
-    print("Choose stations ", randomStations)
-    x = np.zeros((len(inst.stations), len(inst.substation_types)), dtype = int)
-    yonoff = np.zeros((len(inst.stations), len(inst.land_to_sub_cables)), dtype = int)
-    yoffoff = np.zeros((len(inst.stations), len(inst.stations), len(inst.land_to_sub_cables)), dtype = int)
-    for randS in randomStations :
-        x[randS, 0] = 1
-        yonoff[randS, 0] = 1
-    z = np.zeros((len(inst.turbines), len(inst.stations)), dtype=int)
-    for t in range(len(inst.turbines)):
-        bestS = randomStations[0]
-        bestDist = inst.stations[bestS].distance(inst.turbines[t])
-        for randS in randomStations:
-            dist = inst.stations[randS].distance(inst.turbines[t])
-            if (dist < bestDist) :
-                dist = bestDist
-                bestS = randS
-        z[t, bestS] = 1
-    return Solution(inst, x, yonoff, yoffoff, z)
-
-def getNeighbor0(instance, initSol, solCplmt):
+    if verbose:
+        print("Choose stations ", randomStations)
+    stationType = np.full(inst.get_nb_stations(), -1)
+    landCable = np.full(inst.get_nb_stations(), -1)
+    stationType[randomStations] = 0
+    landCable[randomStations] = 0
+    # Nearest chosen station of each turbine
+    nearest = NearestOpenStations(inst, stationType >= 0).nearest
+    return Solution(inst, nearest, stationType, landCable)
+
+def withCheapestConfigs(instance, evaluator, move, stations):
+    # Repair : same move, with the given stations resized to the cheapest configuration for their new load
+    nbTurbines = evaluator.nbTurbines.copy()
+    np.add.at(nbTurbines, evaluator.sol.turbine_station[move.turbines], -1)
+    np.add.at(nbTurbines, move.targets, 1)
+    configs = dict(move.stations)
+    for s in stations:
+        if configs.get(s, (0, 0))[0] == -1 or evaluator.sol.station_type[s] == -1 and s not in configs:
+            continue
+        configs[s] = instance.cheapest_station_config(nbTurbines[s], s)
+    return Move(move.turbines, move.targets, configs, move.subCables)
+
+def newEvaluator(instance, sol):
+    evaluator = IncrementalEvaluator(instance, sol)
+    if granularSize is not None:
+        evaluator.useCandidates(granularSize)
+    if costCacheSize is not None:
+        evaluator.useCostCache(costCacheSize)
+    if tabuTenure is not None:
+        evaluator.useTabu(tabuTenure)
+    return evaluator
+
+def getNeighbor0(instance, initSol, evaluator, accept=improves):
     # Neighbor : changer turbine vers autre station ouverte
-    randTurbine = rd.randint(0, len(instance.turbines) - 1)
+    candidates = evaluator.candidates
+    if candidates is None:
+        randTurbine = rd.randint(0, instance.get_nb_turbines() - 1)
+        stations = np.flatnonzero(initSol.station_type >= 0)
+    else:
+        # Granular : a turbine still worth looking at, towards its nearest sites
+        awake = candidates.awake()
+        if len(awake) == 0:
+            return False, initSol
+        randTurbine = rd.choice(awake)
+        stations = candidates.turbineCandidates[randTurbine]
+        stations = stations[initSol.station_type[stations] >= 0]
 
-    currentSubstation = -1
-    for s in range(len(instance.stations)):
-        if initSol.z[randTurbine, s] == 1:
-            currentSubstation = s
+    currentSubstation = initSol.turbine_station[randTurbine]
     if (currentSubstation == -1) :
         print("No current substation")
-        return
-    
-
-    currentSubstationLoss = solCplmt.lossesInStat[currentSubstation, :].sum() + solCplmt.lossesInStatCable[currentSubstation, :].sum()
-    stationType = np.argmax(initSol.x[currentSubstation, :]) if np.any(initSol.x[currentSubstation, :] == 1) else -1
-    cableType = np.argmax(initSol.y_off_on[currentSubstation, :]) if np.any(initSol.y_off_on[currentSubstation, :] == 1) else -1
-    currentCapacityStat = instance.substation_types[stationType].rating
-    currentCapacityCable = instance.land_to_sub_cables[cableType].rating
-    
-    for s in range(len(instance.stations)):
-        if s == currentSubstation or solCplmt.openStations[s] == 0:
+        return False, initSol
+
+    for s in stations:
+        if s == currentSubstation:
             continue
-        # Station is available : determine change cost
-        diff = instance.variable_cost_cables * (instance.stations[currentSubstation].distance(instance.turbines[randTurbine]) - instance.stations[s].distance(instance.turbines[randTurbine]))
-        nextSubstationLoss = solCplmt.lossesInStat[s, :].sum() + solCplmt.lossesInStat[s, :].sum()
-        nextstationType = np.argmax(initSol.x[s, :]) if np.any(initSol.x[s, :] == 1) else -1
-        nextcableType = np.argmax(initSol.y_off_on[s, :]) if np.any(initSol.y_off_on[s, :] == 1) else -1
-        nextCapacityStat = instance.substation_types[nextstationType].rating
-        nextCapacityCable = instance.land_to_sub_cables[nextcableType].rating
-        for scen in range(len(instance.scenarios)):
-            solCplmt.powerReceived[currentSubstation, scen] -= instance.scenarios[scen].power_generation
-            solCplmt.powerReceived[s, scen] += instance.scenarios[scen].power_generation
-            solCplmt.powerInStat[currentSubstation, scen] = min(solCplmt.powerReceived[currentSubstation, scen], currentCapacityStat)
-            solCplmt.powerInStat[s, scen] = min(solCplmt.powerReceived[s, scen], nextCapacityStat)
-            solCplmt.lossesInStat[s, scen] = solCplmt.powerReceived[s, scen] - solCplmt.powerInStat[s, scen]
-            solCplmt.lossesInStatCable[s, scen] = max(solCplmt.powerInStat[s, scen] - nextCapacityCable, 0)
-            solCplmt.lossesInStat[currentSubstation, scen] = solCplmt.powerReceived[currentSubstation, scen] - solCplmt.powerInStat[currentSubstation, scen]
-            solCplmt.lossesInStatCable[currentSubstation, scen] = max(solCplmt.powerInStat[currentSubstation, scen] - currentCapacityCable, 0)
-        diffLoss = currentSubstationLoss - nextSubstationLoss
-        diff += instance.curtailing_cost * diffLoss
-        if diff > 0:
-            initSol.z[randTurbine, currentSubstation] = 0
-            initSol.z[randTurbine, s] = 1
+        move = RelocateTurbine(randTurbine, s)
+        if accept(evaluator.delta(move)):
+            evaluator.apply(move)
+            return True, initSol
+        move = withCheapestConfigs(instance, evaluator, move, (currentSubstation, s))
+        if accept(evaluator.delta(move)):
+            evaluator.apply(move)
             return True, initSol
-        else :
-            solCplmt.powerReceived[currentSubstation, scen] += instance.scenarios[scen].power_generation
-            solCplmt.powerReceived[s, scen] -= instance.scenarios[scen].power_generation
-            solCplmt.powerInStat[currentSubstation, scen] = min(solCplmt.powerReceived[currentSubstation, scen], currentCapacityStat)
-            solCplmt.powerInStat[s, scen] = min(solCplmt.powerReceived[s, scen], nextCapacityStat)
-            solCplmt.lossesInStat[s, scen] = solCplmt.powerReceived[s, scen] - solCplmt.powerInStat[s, scen]
-            solCplmt.lossesInStatCable[s, scen] = max(solCplmt.powerInStat[s, scen] - nextCapacityCable, 0)
-            solCplmt.lossesInStat[currentSubstation, scen] = solCplmt.powerReceived[currentSubstation, scen] - solCplmt.powerInStat[currentSubstation, scen]
-            solCplmt.lossesInStatCable[currentSubstation, scen] = max(solCplmt.powerInStat[currentSubstation, scen] - currentCapacityCable, 0)
+    if candidates is not None:
+        candidates.dontLook[randTurbine] = True
     return False, initSol
 
-def getNeighbor3(instance, initSol, solCplmt):
+def getNeighbor3(instance, initSol, evaluator, accept=improves):
     # Neighbor : ouverture station
-    if sum(solCplmt.openStations) >= 0.8 * len(solCplmt.openStations) or solCplmt.lossesInStat.sum() == 0:
+    openStations = initSol.station_type >= 0
+    if openStations.sum() >= 0.8 * len(openStations):
         return False, initSol
-    randS = rd.randint(0, len(instance.stations) - 1)
-    while solCplmt.openStations[randS] == 1:
-        randS = rd.randint(0, len(instance.stations) - 1)
-
-    solCplmtCopy = deepcopy(solCplmt)
-    
-    turbinesToChange = []
-
-    solCplmt.openStations[randS] = 1
-    randCableType = rd.randint(0, len(instance.land_to_sub_cables) - 1)
-    randStatType = rd.randint(0, len(instance.substation_types) - 1)
-    initSol.x[randS, randStatType] = 1
-    initSol.y_off_on[randS, randCableType] = 1
-    diff = - instance.substation_types[randStatType].cost
-
-
-    for t in range(len(instance.turbines)):
-        currentStation = np.argmax(initSol.z[t, :])
-        currentSubstationLoss = solCplmt.lossesInStat[currentStation, :].sum() + solCplmt.lossesInStatCable[currentStation, :].sum()
-        stationType = np.argmax(initSol.x[currentStation, :]) if np.any(initSol.x[currentStation, :] == 1) else -1
-        cableType = np.argmax(initSol.y_off_on[currentStation, :]) if np.any(initSol.y_off_on[currentStation, :] == 1) else -1
-        currentCapacityStat = instance.substation_types[stationType].rating
-        currentCapacityCable = instance.land_to_sub_cables[cableType].rating
-        if instance.stations[randS].distance(instance.turbines[t]) < instance.stations[randS].distance(instance.turbines[t]) or solCplmt.lossesInStat[currentStation, :].sum() > 0:
-            diffLoc = instance.variable_cost_cables * (instance.stations[currentStation].distance(instance.turbines[t]) - instance.stations[randS].distance(instance.turbines[t]))
-            nextSubstationLoss = solCplmt.lossesInStat[randS, :].sum() + solCplmt.lossesInStat[randS, :].sum()
-            nextstationType = np.argmax(initSol.x[randS, :]) if np.any(initSol.x[randS, :] == 1) else -1
-            nextcableType = np.argmax(initSol.y_off_on[randS, :]) if np.any(initSol.y_off_on[randS, :] == 1) else -1
-            nextCapacityStat = instance.substation_types[nextstationType].rating
-            nextCapacityCable = instance.land_to_sub_cables[nextcableType].rating
-            for scen in range(len(instance.scenarios)):
-                solCplmt.powerReceived[currentStation, scen] -= instance.scenarios[scen].power_generation
-                solCplmt.powerReceived[randS, scen] += instance.scenarios[scen].power_generation
-                solCplmt.powerInStat[currentStation, scen] = min(solCplmt.powerReceived[currentStation, scen], currentCapacityStat)
-                solCplmt.powerInStat[randS, scen] = min(solCplmt.powerReceived[randS, scen], nextCapacityStat)
-                solCplmt.lossesInStat[randS, scen] = solCplmt.powerReceived[randS, scen] - solCplmt.powerInStat[randS, scen]
-                solCplmt.lossesInStatCable[randS, scen] = max(solCplmt.powerInStat[randS, scen] - nextCapacityCable, 0)
-                solCplmt.lossesInStat[currentStation, scen] = solCplmt.powerReceived[currentStation, scen] - solCplmt.powerInStat[currentStation, scen]
-                solCplmt.lossesInStatCable[currentStation, scen] = max(solCplmt.powerInStat[currentStation, scen] - currentCapacityCable, 0)
-            diffLoss = currentSubstationLoss + nextSubstationLoss - solCplmt.lossesInStat[currentStation, :].sum() + solCplmt.lossesInStatCable[currentStation, :].sum() - solCplmt.lossesInStat[randS, :].sum() + solCplmt.lossesInStatCable[randS, :].sum()
-            diffLoc += instance.curtailing_cost * diffLoss
-            if diffLoc > 0:
-                turbinesToChange.append(t)
-                diff += diffLoc
-            else :
-                solCplmt.powerReceived[currentStation, scen] += instance.scenarios[scen].power_generation
-                solCplmt.powerReceived[randS, scen] -= instance.scenarios[scen].power_generation
-                solCplmt.powerInStat[currentStation, scen] = min(solCplmt.powerReceived[currentStation, scen], currentCapacityStat)
-                solCplmt.powerInStat[randS, scen] = min(solCplmt.powerReceived[randS, scen], nextCapacityStat)
-                solCplmt.lossesInStat[randS, scen] = solCplmt.powerReceived[randS, scen] - solCplmt.powerInStat[randS, scen]
-                solCplmt.lossesInStatCable[randS, scen] = max(solCplmt.powerInStat[randS, scen] - nextCapacityCable, 0)
-                solCplmt.lossesInStat[currentStation, scen] = solCplmt.powerReceived[currentStation, scen] - solCplmt.powerInStat[currentStation, scen]
-                solCplmt.lossesInStatCable[currentStation, scen] = max(solCplmt.powerInStat[currentStation, scen] - currentCapacityCable, 0)
-    if diff > 0:
-        for t in turbinesToChange:
-            currentStation = np.argmax(initSol.z[t, :])
-            initSol.z[t, currentStation] = 0
-            initSol.z[t, randS] = 1
+    randS = rd.choice(np.flatnonzero(~openStations))
+
+    # Turbines for which the new station becomes the nearest open one
+    turbinesToChange = evaluator.nearestOpen.gains(randS)
+    if evaluator.candidates is not None:
+        turbinesToChange = turbinesToChange[evaluator.candidates.inList[turbinesToChange, randS]]
+
+    # The new station is sized for its turbines
+    statType, cableType = instance.cheapest_station_config(len(turbinesToChange), randS)
+    move = OpenStation(randS, statType, cableType, turbinesToChange)
+    if accept(evaluator.delta(move)):
+        evaluator.apply(move)
         return True, initSol
-    else:
-        initSol.x[randS, randStatType] = 0
-        initSol.yonoff[randS, randCableType] = 0
-        solCplmt = solCplmtCopy
     return False, initSol
 
-def getNeighbor2(instance, initSol, solCplmt):
+def getNeighbor2(instance, initSol, evaluator, accept=improves):
     # Neighbor : close station
-    openStationsIndexes = [s for s in range(len(instance.stations)) if solCplmt.openStations[s] == 1]
+    openStationsIndexes = np.flatnonzero(initSol.station_type >= 0)
     if (len(openStationsIndexes) == 1):
         return False, initSol
-    randS = np.random.choice(openStationsIndexes)
-    if solCplmt.openStations[randS] == 0:
-        print("Not OK")
-        return
-    
-    newSol = deepcopy(initSol)
-    newSolCplmt = deepcopy(solCplmt)
-
-    solCplmt.openStations[randS] = 0
-    randCableType = np.argmax(newSol.y_off_on[randS, :])
-    randStatType = np.argmax(newSol.x[randS, :])
-    newSol.x[randS, randStatType] = 0
-    newSol.y_off_on[randS, randCableType] = 0
-    diff = instance.substation_types[randStatType].cost
-    print(diff)
-
-    turbinesToChange = []
-    for t in range(len(instance.turbines)):
-        if newSol.z[t, randS] == 1 :
-            turbinesToChange.append(t)
-            bestS = np.argmax(solCplmt.openStations)
-            bestDist = instance.stations[bestS].distance(instance.turbines[t])
-            for s in range(len(instance.stations)) :
-                if solCplmt.openStations[s] == 0: 
-                    continue
-                dist = instance.stations[s].distance(instance.turbines[t])
-                if dist < bestDist :
-                    dist = bestDist
-                    bestS = s
-            newSol.z[t, s] = 1
-            newSol.z[t, randS] = 0
-            stationType = np.argmax(initSol.x[bestS, :]) if np.any(initSol.x[bestS, :] == 1) else -1
-            cableType = np.argmax(initSol.y_off_on[bestS, :]) if np.any(initSol.y_off_on[bestS, :] == 1) else -1
-            capacityStat = instance.substation_types[stationType].rating
-            capacityCable = instance.land_to_sub_cables[cableType].rating
-            for scen in range(len(instance.scenarios)):
-                newSolCplmt.powerReceived[bestS, scen] += instance.scenarios[scen].power_generation
-                newSolCplmt.powerInStat[bestS, scen] = min(solCplmt.powerReceived[bestS, scen], capacityStat)
-                newSolCplmt.lossesInStat[bestS, scen] = solCplmt.powerReceived[bestS, scen] - solCplmt.powerInStat[bestS, scen]
-                newSolCplmt.lossesInStatCable[bestS, scen] = max(solCplmt.powerInStat[bestS, scen] - capacityCable, 0)
-            diff += instance.curtailing_cost * (solCplmt.lossesInStat[bestS, :].sum() + solCplmt.lossesInStatCable[bestS].sum() - newSolCplmt.lossesInStat[bestS, :].sum() - newSolCplmt.lossesInStatCable[bestS].sum())
-
-    if diff > 0:
-        solCplmt = newSolCplmt
-        return True, newSol
-    else:
-        return False, initSol
+    randS = rd.choice(openStationsIndexes)
+
+    # Turbines go to the nearest remaining open station
+    turbinesToChange = np.flatnonzero(initSol.turbine_station == randS)
+    targets = evaluator.nearestOpen.nearestTo(turbinesToChange, exclude=randS)
 
-def getNeighbor1(instance, initSol, solCplmt):
+    move = CloseStation(initSol, randS, targets)
+    if accept(evaluator.delta(move)):
+        evaluator.apply(move)
+        return True, initSol
+    move = withCheapestConfigs(instance, evaluator, move, np.unique(targets))
+    if accept(evaluator.delta(move)):
+        evaluator.apply(move)
+        return True, initSol
+    return False, initSol
+
+def getNeighbor1(instance, initSol, evaluator, accept=improves):
     # Neighbor : changer type de station
-    openStationsIndexes = [s for s in range(len(instance.stations)) if solCplmt.openStations[s] == 1]
-    randS = np.random.choice(openStationsIndexes)
-    randCableType = np.argmax(initSol.y_off_on[randS, :])
-    randSType = np.argmax(initSol.x[randS, :])
-    newSType = rd.randint(0, len(instance.substation_types) - 1)
-    newcapacityStat = instance.substation_types[newSType].rating
-    capacityCable = instance.land_to_sub_cables[randCableType].rating
-    diff = instance.substation_types[randSType].cost - instance.substation_types[newSType].cost
-    
-    diffLoss = 0
-
-    for scen in range(len(instance.scenarios)):
-        newPowerInStat = min(solCplmt.powerReceived[randS, scen], newcapacityStat)
-        diffLoss += solCplmt.lossesInStat[randS, scen] - (solCplmt.powerReceived[randS, scen] - solCplmt.powerInStat[randS, scen])
-        diffLoss += solCplmt.lossesInStatCable[randS, scen] - max(newPowerInStat - capacityCable, 0)
-    
-    diff += instance.curtailing_cost * diffLoss
-    
-    if diff > 0:
-        initSol.x[randS, newSType] = 1
-        initSol.x[randS, randSType] = 0
-        for scen in range(len(instance.scenarios)):
-            solCplmt.powerInStat[randS, scen] = min(solCplmt.powerReceived[randS, scen], newcapacityStat)
-            solCplmt.lossesInStat[randS, scen] = solCplmt.powerReceived[randS, scen] - solCplmt.powerInStat[randS, scen]
-            solCplmt.lossesInStatCable[randS, scen] = max(solCplmt.powerInStat[randS, scen] - capacityCable, 0)
-        print("We found a good neighbor 1")
+    randS = rd.choice(np.flatnonzero(initSol.station_type >= 0))
+    newSType = rd.choice(instance.substation_type_candidates)
+    if newSType == initSol.station_type[randS]:
+        return False, initSol
+
+    move = ChangeStationType(initSol, randS, newSType)
+    if accept(evaluator.delta(move)):
+        evaluator.apply(move)
+        if verbose:
+            print("We found a good neighbor 1")
         return True, initSol
-    else : 
+    return False, initSol
+
+def getNeighbor4(instance, initSol, evaluator, accept=improves):
+    # Neighbor : changer type de cable vers la terre
+    randS = rd.choice(np.flatnonzero(initSol.station_type >= 0))
+    newCableType = rd.choice(instance.land_cable_candidates)
+    if newCableType == initSol.land_cable[randS]:
         return False, initSol
 
-def getNeighbor4(instance, initSol, solCplmt):
-    # Neighbor : changer type de station
-    return
+    move = ChangeLandCable(initSol, randS, newCableType)
+    if accept(evaluator.delta(move)):
+        evaluator.apply(move)
+        return True, initSol
+    return False, initSol
 
-def getNeighbor(instance, initSol, solCplmt, voisType):
-    if (voisType < 0 or voisType > 4) :
+def getNeighbor5(instance, initSol, evaluator, accept=improves):
+    # Neighbor : meilleures relocalisations de turbines, evaluees toutes ensemble
+    openStations, deltas = evaluator.relocationDeltas()
+    if evaluator.candidates is not None:
+        deltas[~evaluator.candidates.inList[:, openStations]] = np.inf
+    # Best target of each turbine, most promising turbines first
+    targets = np.argmin(deltas, axis=1)
+    gains = deltas[np.arange(len(targets)), targets]
+    used = set()
+    success = False
+    for t in np.argsort(gains):
+        if gains[t] >= -eps:
+            break
+        source, target = initSol.turbine_station[t], openStations[targets[t]]
+        # While the penalty is inactive, moves on disjoint stations and partners do not change each other's
+        # estimate; once it is active every failure case depends on the shared total curtailment, and the
+        # estimate is only a guide
+        stations = {source, target, evaluator.partner[source], evaluator.partner[target]} - {-1}
+        if used & stations:
+            continue
+        # The estimate ignores the curtailment penalty, every move is checked exactly
+        move = RelocateTurbine(t, target)
+        if accept(evaluator.delta(move)):
+            evaluator.apply(move)
+            success = True
+            if not batchNonConflicting:
+                break
+            used |= stations
+    return success, initSol
+
+def getNeighbor6(instance, initSol, evaluator, accept=improves):
+    # Neighbor : meilleur cable entre stations (ajout, changement de type ou retrait)
+    if (initSol.station_type >= 0).sum() < 2:
+        return False, initSol
+    stations, cables, deltas, removal = evaluator.linkDeltas()
+    if evaluator.candidates is not None:
+        # Granular : pairs of nearby sites only
+        near = np.zeros((instance.get_nb_stations(),) * 2, dtype=bool)
+        np.put_along_axis(near, evaluator.candidates.stationCandidates, True, axis=1)
+        near = near[np.ix_(stations, stations)]
+        deltas[~(near | near.T)] = np.inf
+
+    s1, s2, c = np.unravel_index(np.argmin(deltas), deltas.shape)
+    if not np.isfinite(min(removal.min(), deltas[s1, s2, c])):
+        # No pair left, argmin would pick the cable from a station to itself
+        return False, initSol
+    if removal.min() < deltas[s1, s2, c]:
+        s = stations[np.argmin(removal)]
+        move = SetSubCable(int(s), int(evaluator.partner[s]), -1)
+    else:
+        move = SetSubCable(int(stations[s1]), int(stations[s2]), int(cables[c]))
+    if accept(evaluator.delta(move)):
+        evaluator.apply(move)
+        return True, initSol
+    return False, initSol
+
+def getNeighbor(instance, initSol, evaluator, voisType, accept=improves):
+    if (voisType < 0 or voisType > 6) :
         print("Error of neighborhoods")
         return
     if (voisType == 0):
-        return getNeighbor0(instance, initSol, solCplmt)
+        return getNeighbor0(instance, initSol, evaluator, accept)
     if (voisType == 1):
-        return getNeighbor1(instance, initSol, solCplmt)
+        return getNeighbor1(instance, initSol, evaluator, accept)
     if (voisType == 2):
-        return getNeighbor2(instance, initSol, solCplmt)
+        return getNeighbor2(instance, initSol, evaluator, accept)
     if (voisType == 3):
-        return getNeighbor3(instance, initSol, solCplmt)
+        return getNeighbor3(instance, initSol, evaluator, accept)
     if (voisType == 4):
-        return getNeighbor4(instance, initSol, solCplmt)
-
-def mainLSinst(instance):
-    for rdSol in range(nbRandomSols):
-        initSol = getRandomSol(instance)
-        initSol.export_solution_json("small_Try.json")
-        solCplmt = SolutionComplement(instance, initSol)
-        nbIters = -1
-        voisType = 0
-        nbIterWOSucc = 0
-        while nbIters < nbMaxIters :
-            nbIters += 1
-            success, initSol = getNeighbor(instance, initSol, solCplmt, voisType)
-            if (success) :
-                nbIterWOSucc = 0
-            else :
-                nbIterWOSucc += 1
-    
-            if nbIterWOSucc >= 10 :
-                voisType += 1
-                print("Upgrading to voisinage ", voisType)
-                if voisType == 2:
-                    break
-                nbIterWOSucc = 0
-        initSol.export_solution_json("small_Try_Fin.json")
+        return getNeighbor4(instance, initSol, evaluator, accept)
+    if (voisType == 5):
+        return getNeighbor5(instance, initSol, evaluator, accept)
+    if (voisType == 6):
+        return getNeighbor6(instance, initSol, evaluator, accept)
+
+def runLocalSearch(instance, initSol, evaluator, deadline=None, tracer=None, checkpoint=None, criterion=None, bound=None, chooser=None):
+    # Neighborhoods chosen by the adaptive scheduler chooser (a new one when None, the same one across searches
+    # keeps its rates), moves accepted by criterion (a new one of the acceptance global when None), until the
+    # deadline or nbMaxIters iterations without one, or nbStallIters iterations without improving the best
+    # solution, or targetGap reached to the lower bound when given;
+    # initSol, and the evaluator, end on the best solution visited
+    criterion = criterion or scheduler.criteria[acceptance]()
+    chooser = chooser or scheduler.AdaptiveScheduler()
+    criterion.start(evaluator.cost)
+    # Only copied when the criterion may leave the best solution
+    best = None if isinstance(criterion, scheduler.Descent) else initSol.copy()
+    bestCost = evaluator.cost
+    start = time.perf_counter()
+    nbIters = 0
+    nbItersWOImprovement = 0
+    while nbItersWOImprovement < nbStallIters:
+        now = time.perf_counter()
+        if deadline is not None:
+            if now >= deadline:
+                break
+            progress = (now - start) / (deadline - start)
+        else:
+            if nbIters >= nbMaxIters:
+                break
+            progress = nbIters / nbMaxIters
+        criterion.update(evaluator.cost, progress)
+        nbIters += 1
+        voisType = chooser.choose()
+        cost = evaluator.cost
+        if tracer is not None:
+            tracer.startIteration()
+        success, initSol = getNeighbor(instance, initSol, evaluator, voisType, criterion.accept)
+        if tracer is not None:
+            tracer.endIteration(voisType, success, evaluator.cost)
+        chooser.record(voisType, cost - evaluator.cost, time.perf_counter() - now)
+        if checkpoint is not None:
+            checkpoint.step(evaluator)
+
+        if evaluator.cost < bestCost - eps:
+            bestCost = evaluator.cost
+            nbItersWOImprovement = 0
+            if best is not None:
+                best = initSol.copy()
+            if bound is not None and reportGap(bestCost, bound, tracer):
+                break
+        else:
+            nbItersWOImprovement += 1
+
+    if best is not None and evaluator.cost > bestCost + eps:
+        initSol.turbine_station[:] = best.turbine_station
+        initSol.station_type[:] = best.station_type
+        initSol.land_cable[:] = best.land_cable
+        initSol.sub_cables = best.sub_cables
+        evaluator.refresh()
+    if verbose:
+        print(f"{nbIters} iterations, neighborhood rates (improvement per ms): {np.round(chooser.rates(), 3)}")
+    return initSol
+
+def reportGap(cost, bound, tracer=None):
+    # Gap of a new best cost to the lower bound, True once targetGap is reached
+    import bounding
+
+    gap = bounding.gap(cost, bound)
+    if verbose:
+        print(f"Cost {cost:.2f}, gap {gap:.2%} to the lower bound {bound:.2f}")
+    if tracer is not None:
+        tracer.event("gap", cost=cost, bound=bound, gap=gap)
+    return targetGap is not None and gap <= targetGap
+
+def mainLSinst(instance, name=None, timeLimit=None, seed=None, tracer=None, checkpoint=None, startSol=None):
+    # Best of the local searches run within timeLimit seconds (nbRandomSols of them without a limit),
+    # exported to <name>_Try*.json when name is given. The first search starts from startSol when given
+    # (resume or warm start), the ones after the nbRandomSols starts from the best solution; the incumbent is saved to checkpoint.
+    # With targetGap, the searches stop once the best solution is within targetGap of the lower bound,
+    # recorded in tracer.bound
+    if seed is not None:
+        rd.seed(seed)
+    deadline = None if timeLimit is None else time.perf_counter() + timeLimit
+    bestSol, bestCost = None, np.inf
+    bound = None
+    rdSol = 0
+    while rdSol < nbRandomSols or deadline is not None:
+        if bestSol is not None and deadline is not None and time.perf_counter() >= deadline:
+            break
+        if bound is not None and bestCost < np.inf and bounding.gap(bestCost, bound) <= targetGap:
+            break
+        if rdSol == 0 and startSol is not None:
+            initSol = startSol.copy()
+        elif rdSol == 0 and heuristicStart:
+            initSol = dropHeuristic(instance)
+        elif rdSol < nbRandomSols:
+            initSol = getRandomSol(instance)
+        else:
+            initSol = bestSol.copy()
+        rdSol += 1
+        if name is not None:
+            initSol.export_solution_json(f"{name}_Try.json")
+        evaluator = newEvaluator(instance, initSol)
+        if tracer is not None:
+            tracer.attach(evaluator)
+        reached = False
+        if targetGap is not None and rdSol == 1:
+            # Imported here, SciPy is only needed for the bound
+            import bounding
+
+            # Solutions costing more than the first one cannot be optimal, which tightens the bound;
+            # the searches keep the rest of the budget
+            boundDeadline = None if deadline is None else time.perf_counter() + boundShare * (deadline - time.perf_counter())
+            bound = bounding.lowerBound(instance, evaluator.cost, boundDeadline)
+            if tracer is not None:
+                tracer.bound = bound
+            reached = bound is not None and reportGap(evaluator.cost, bound, tracer)
+        if not reached:
+            initSol = runLocalSearch(instance, initSol, evaluator, deadline, tracer, checkpoint, bound=bound)
+        if name is not None:
+            initSol.export_solution_json(f"{name}_Try_Fin.json")
+        if evaluator.cost < bestCost:
+            bestSol, bestCost = initSol, evaluator.cost
+            if checkpoint is not None:
+                checkpoint.save(bestSol, bestCost)
+    return bestSol
 
 def mainLS():
-    return mainLSinst(Instance("./instances/small.json"))
+    return mainLSinst(Instance("./instances/small.json"), "small")
 
-mainLS()
+if __name__ == "__main__":
+    mainLS()
@@ -1,15 +1,111 @@
-from classes import *
+import argparse
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
-instances_size = ['toy', 'small', 'medium', 'large', 'huge']
+import localSearch as ls
+from checkpoint import Checkpoint
+from classes import Instance, Solution
+from instrumentation import Tracer
+from population import runMemetic
 
-size = instances_size[0]
 
-pathfile = f'./instances/{size}.json'
+def solveInstance(instancePath, timeLimit, seed, outputDir, checkpointPeriod=None, mode="ls", targetGap=None, traceDir=None, startPath=None):
+    # Solve one instance and write <instance>_best.json in outputDir, returns its summary
+    # The search starts from the solution file startPath ({name} standing for the instance name) when it exists
+    # With targetGap, the local search stops within targetGap of the lower bound, reported in the summary
+    # With traceDir, the search events are written to <instance>_trace.jsonl in traceDir
+    ls.verbose = False
+    ls.targetGap = targetGap
+    name = os.path.splitext(os.path.basename(instancePath))[0]
+    start = time.perf_counter()
+    instance = Instance(instancePath)
+    checkpoint = None
+    if checkpointPeriod is not None:
+        checkpoint = Checkpoint(os.path.join(outputDir, f"{name}_checkpoint"), period=checkpointPeriod)
 
-f = open(pathfile)
- 
-# returns JSON object as 
-# a dictionary
-data = json.load(f)
+    startSol = None
+    if startPath is not None and os.path.exists(startPath.format(name=name)):
+        startSol = Solution.load(instance, startPath.format(name=name))
 
-len(data['substation_location'])
\ No newline at end of file
+    tracePath = None if traceDir is None else os.path.join(traceDir, f"{name}_trace.jsonl")
+    tracer = Tracer(tracePath)
+    if mode == "memetic":
+        sol, _ = runMemetic(instance, timeLimit=timeLimit, seed=seed, tracer=tracer, startSol=startSol)
+        if checkpoint is not None:
+            checkpoint.save(sol, sol.evaluate())
+    else:
+        sol = ls.mainLSinst(instance, timeLimit=timeLimit, seed=seed, tracer=tracer, checkpoint=checkpoint, startSol=startSol)
+    tracer.close()
+    outputPath = os.path.join(outputDir, f"{name}_best.json")
+    sol.export_solution_json(outputPath)
+
+    result = {
+        "instance": name,
+        "cost": sol.evaluate(),
+        "time": time.perf_counter() - start,
+        "iterations": sum(tracer.calls.values()),
+        "solution": outputPath,
+        "start": None if startSol is None else startPath.format(name=name),
+        "neighborhoods": tracer.summary(),
+    }
+    if tracePath is not None:
+        result["trace"] = tracePath
+    # The bound of the search, when it was solved within its share of the budget
+    if tracer.bound is not None:
+        import bounding
+
+        result["lower_bound"] = tracer.bound
+        result["gap"] = bounding.gap(result["cost"], tracer.bound)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Solve the instances with the local search")
+    parser.add_argument("instances", nargs="*", default=sorted(glob.glob("./instances/*.json")))
+    parser.add_argument("--time", type=float, default=60.0, help="time budget per instance, in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="instances solved at the same time")
+    parser.add_argument("--output-dir", default=".")
+    parser.add_argument("--summary", default="summary.json")
+    parser.add_argument("--checkpoint", type=float, metavar="SECONDS", help="save the incumbent every SECONDS")
+    parser.add_argument(
+        "--start", metavar="PATH",
+        help="start from the solution (.json or .npz checkpoint) PATH where it exists, {name} standing for the instance name",
+    )
+    parser.add_argument("--resume", action="store_true", help="start from the checkpoints of --output-dir, same as --start OUTPUT_DIR/{name}_checkpoint.npz")
+    parser.add_argument("--mode", choices=("ls", "memetic"), default="ls", help="local search or memetic search")
+    parser.add_argument("--target-gap", type=float, metavar="GAP", help="stop the local search within GAP (e.g. 0.05) of the lower bound")
+    parser.add_argument("--trace", metavar="PATH", help="directory receiving a JSONL trace of the search events of each instance")
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    if args.resume:
+        args.start = os.path.join(args.output_dir, "{name}_checkpoint.npz")
+    if args.trace is not None:
+        os.makedirs(args.trace, exist_ok=True)
+    results = []
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [
+            pool.submit(solveInstance, path, args.time, args.seed, args.output_dir, args.checkpoint, args.mode, args.target_gap, args.trace, args.start)
+            for path in args.instances
+        ]
+        for future in as_completed(futures):
+            result = future.result()
+            gap = f", gap {result['gap']:.2%}" if "gap" in result else ""
+            print(f"{result['instance']:>8}: cost {result['cost']:.2f}{gap}, {result['iterations']} iterations in {result['time']:.2f}s")
+            # The neighborhood table is printed, not kept in the summary file
+            print(result.pop("neighborhoods"))
+            results.append(result)
+
+    results.sort(key=lambda result: result["instance"])
+    summary = {"time_budget": args.time, "seed": args.seed, "mode": args.mode, "target_gap": args.target_gap, "results": results}
+    with open(os.path.join(args.output_dir, args.summary), "w") as f:
+        json.dump(summary, f, indent=1)
+    print(f"Summary written to {os.path.join(args.output_dir, args.summary)}")
+
+
+if __name__ == "__main__":
+    main()
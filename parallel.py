@@ -0,0 +1,282 @@
+import os
+import random as rd
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context, shared_memory
+
+import numpy as np
+
+import localSearch as ls
+import scheduler
+from classes import Instance, Solution, pack_instance_columns, unpack_instance_columns
+from instrumentation import Tracer
+
+# Seconds between two synchronizations of a portfolio worker with the incumbent
+syncPeriod = 1.0
+# Iterations without improving its best solution after which a portfolio worker restarts from the incumbent
+nbStagnationIters = 200
+
+
+class SharedInstance:
+    # Columns of an instance in a shared memory block, attached by the workers without copy
+    name: str
+    layout: dict
+    size: int
+
+    def __init__(self, instance) -> None:
+        self.layout, data = pack_instance_columns(instance.get_columns())
+        self.size = len(data)
+        self._block = shared_memory.SharedMemory(create=True, size=max(data.nbytes, 1))
+        self.name = self._block.name
+        np.ndarray(data.shape, dtype=data.dtype, buffer=self._block.buf)[:] = data
+
+        return None
+
+    def __getstate__(self):
+        return {"name": self.name, "layout": self.layout, "size": self.size}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._block = None
+
+    def attach(self):
+        # Pool workers share the resource tracker of the parent, which unlinks the block
+        block = shared_memory.SharedMemory(name=self.name)
+        data = np.ndarray((self.size,), dtype=float, buffer=block.buf)
+        return block, Instance(columns=unpack_instance_columns(self.layout, data))
+
+    def close(self):
+        self._block.close()
+        self._block.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class SharedIncumbent:
+    # Best known solution of a portfolio, in a shared memory slot guarded by a lock
+    # Layout: cost, version, turbine_station, station_type, land_cable, sub-cable partner, sub-cable type
+    name: str
+
+    def __init__(self, instance) -> None:
+        self.nbTurbines = instance.get_nb_turbines()
+        self.nbStations = instance.get_nb_stations()
+        size = 2 + self.nbTurbines + 4 * self.nbStations
+        self._block = shared_memory.SharedMemory(create=True, size=size * 8)
+        self.name = self._block.name
+        self.lock = get_context().Lock()
+        self.slot = np.ndarray((size,), dtype=float, buffer=self._block.buf)
+        self.slot[:2] = np.inf, 0
+
+        return None
+
+    def __getstate__(self):
+        return {"name": self.name, "lock": self.lock, "nbTurbines": self.nbTurbines, "nbStations": self.nbStations}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._block = shared_memory.SharedMemory(name=self.name)
+        self.slot = np.ndarray((2 + self.nbTurbines + 4 * self.nbStations,), dtype=float, buffer=self._block.buf)
+
+    @property
+    def cost(self):
+        return self.slot[0]
+
+    @property
+    def version(self):
+        # Number of publications so far
+        return int(self.slot[1])
+
+    def publish(self, sol, cost):
+        # Replace the incumbent by sol if it is better, return whether it was
+        with self.lock:
+            if cost >= self.slot[0] - ls.eps:
+                return False
+            partner, cable = sol.get_sub_cables()
+            self.slot[:2] = cost, self.slot[1] + 1
+            self.slot[2:] = np.concatenate((sol.turbine_station, sol.station_type, sol.land_cable, partner, cable))
+            return True
+
+    def solution(self, instance):
+        # Copy of the incumbent, None before the first publication
+        with self.lock:
+            if self.version == 0:
+                return None
+            values = self.slot[2:].astype(int)
+        turbineStation, values = np.split(values, [self.nbTurbines])
+        stationType, landCable, partner, cable = np.split(values, 4)
+        subCables = {(int(s), int(partner[s])): int(cable[s]) for s in np.flatnonzero(partner > np.arange(self.nbStations))}
+        return Solution(instance, turbineStation, stationType, landCable, subCables)
+
+    def close(self):
+        self.slot = None
+        self._block.close()
+        self._block.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+# Instance of the worker process, set once by the pool initializer
+_workerBlock = None
+_workerInstance = None
+_incumbent = None
+
+
+def _initWorker(sharedInstance, incumbent=None):
+    global _workerBlock, _workerInstance, _incumbent
+    ls.verbose = False
+    _workerBlock, _workerInstance = sharedInstance.attach()
+    _incumbent = incumbent
+
+
+def _runChain(seed, timeLimit, heuristic=False):
+    # One start followed by a local search, with its own seed: random, or the constructive heuristic when heuristic
+    ls.heuristicStart = heuristic
+    tracer = Tracer()
+    start = time.perf_counter()
+    sol = ls.mainLSinst(_workerInstance, timeLimit=timeLimit, seed=seed, tracer=tracer)
+    stats = {
+        "seed": seed,
+        "pid": os.getpid(),
+        "cost": sol.evaluate(),
+        "elapsed": time.perf_counter() - start,
+        "iterations": sum(tracer.calls.values()),
+        "neighborhoods": tracer.neighborhoodStats(),
+        "history": tracer.history,
+    }
+    return (sol.turbine_station, sol.station_type, sol.land_cable, sol.sub_cables), stats
+
+
+def chainSeeds(seed, nbChains):
+    # Independent seeds for the chains, derived from a single one
+    return [int(s.generate_state(1)[0]) for s in np.random.SeedSequence(seed).spawn(nbChains)]
+
+
+def heuristicStarts(nbChains):
+    # The deterministic heuristic start is given to the first chain only, the others start at random
+    return [ls.heuristicStart] + [False] * (nbChains - 1)
+
+
+def parallelMultiStart(instance, nbChains, nbWorkers=None, timeLimit=None, seed=0):
+    # Best solution of nbChains independent local searches run on nbWorkers processes, and per-chain statistics
+    nbWorkers = nbWorkers or os.cpu_count()
+    with SharedInstance(instance) as sharedInstance:
+        with ProcessPoolExecutor(max_workers=nbWorkers, initializer=_initWorker, initargs=(sharedInstance,)) as pool:
+            results = list(pool.map(_runChain, chainSeeds(seed, nbChains), [timeLimit] * nbChains, heuristicStarts(nbChains)))
+
+    chains = [stats for _, stats in results]
+    arrays, _ = min(results, key=lambda result: result[1]["cost"])
+    return Solution(instance, *arrays), chains
+
+
+class Chain:
+    # Search state of a portfolio worker: current solution with its evaluator, best solution seen,
+    # neighborhood scheduler kept across rounds, and annealing criterion cooling from now to the deadline
+    def __init__(self, instance, sol, deadline) -> None:
+        self.instance = instance
+        self.evaluator = ls.newEvaluator(instance, sol)
+        self.best = sol.copy()
+        self.bestCost = self.evaluator.cost
+        self.itersWOImprovement = 0
+        self.chooser = scheduler.AdaptiveScheduler()
+        self.annealing = scheduler.Annealing()
+        self.annealing.start(self.evaluator.cost)
+        self.start = time.perf_counter()
+        self.deadline = deadline
+
+        return None
+
+    @property
+    def sol(self):
+        return self.evaluator.sol
+
+    def record(self):
+        # Keep the current solution if it is the best of the chain
+        if self.evaluator.cost < self.bestCost - ls.eps:
+            self.best = self.sol.copy()
+            self.bestCost = self.evaluator.cost
+            self.itersWOImprovement = 0
+        else:
+            self.itersWOImprovement += 1
+
+    def progress(self):
+        # Spent part of the time left to the chain when it started
+        return (time.perf_counter() - self.start) / max(self.deadline - self.start, 1e-9)
+
+
+def cyclingRound(chain, deadline):
+    # The adaptive neighborhood search of mainLSinst, stagnated once it stops before the deadline
+    ls.runLocalSearch(chain.instance, chain.sol, chain.evaluator, deadline, chooser=chain.chooser)
+    chain.record()
+    return time.perf_counter() < deadline
+
+
+def annealingRound(chain, deadline):
+    # Random neighborhoods with annealing acceptance
+    while time.perf_counter() < deadline and chain.itersWOImprovement < nbStagnationIters:
+        chain.annealing.update(chain.evaluator.cost, chain.progress())
+        ls.getNeighbor(chain.instance, chain.sol, chain.evaluator, rd.randint(0, 6), chain.annealing.accept)
+        chain.record()
+    return chain.itersWOImprovement >= nbStagnationIters
+
+
+def relocationRound(chain, deadline):
+    # Turbine relocations only: batched best moves, random ones once the estimate finds nothing
+    while time.perf_counter() < deadline and chain.itersWOImprovement < nbStagnationIters:
+        success, _ = ls.getNeighbor5(chain.instance, chain.sol, chain.evaluator)
+        if not success:
+            ls.getNeighbor0(chain.instance, chain.sol, chain.evaluator)
+        chain.record()
+    return chain.itersWOImprovement >= nbStagnationIters
+
+
+strategies = {"cycling": cyclingRound, "annealing": annealingRound, "relocation": relocationRound}
+
+
+def _runStrategy(strategy, seed, timeLimit, heuristic=False):
+    # Portfolio worker: rounds of its strategy, publishing its best solution and restarting from the incumbent when stagnating
+    rd.seed(seed)
+    instance = _workerInstance
+    start = time.perf_counter()
+    deadline = start + timeLimit
+    chain = Chain(instance, ls.dropHeuristic(instance) if heuristic else ls.getRandomSol(instance), deadline)
+    best, bestCost = chain.best, chain.bestCost
+    stats = {"strategy": strategy, "seed": seed, "pid": os.getpid(), "rounds": 0, "publications": 0, "restarts": 0, "history": []}
+
+    while time.perf_counter() < deadline:
+        stagnated = strategies[strategy](chain, min(deadline, time.perf_counter() + syncPeriod))
+        stats["rounds"] += 1
+        if chain.bestCost < bestCost:
+            best, bestCost = chain.best, chain.bestCost
+            stats["history"].append((time.perf_counter() - start, bestCost))
+        if _incumbent.publish(best, bestCost):
+            stats["publications"] += 1
+        if stagnated:
+            chain = Chain(instance, _incumbent.solution(instance), deadline)
+            stats["restarts"] += 1
+
+    stats["cost"] = bestCost
+    stats["elapsed"] = time.perf_counter() - start
+    return (best.turbine_station, best.station_type, best.land_cable, best.sub_cables), stats
+
+
+def parallelPortfolio(instance, nbWorkers=None, timeLimit=10.0, seed=0, portfolio=("cycling", "annealing", "relocation")):
+    # Best solution found by nbWorkers cooperating processes, running the strategies of portfolio in turn, and per-worker statistics
+    nbWorkers = nbWorkers or os.cpu_count()
+    workerStrategies = [portfolio[i % len(portfolio)] for i in range(nbWorkers)]
+    with SharedInstance(instance) as sharedInstance, SharedIncumbent(instance) as incumbent:
+        with ProcessPoolExecutor(max_workers=nbWorkers, initializer=_initWorker, initargs=(sharedInstance, incumbent)) as pool:
+            results = list(
+                pool.map(_runStrategy, workerStrategies, chainSeeds(seed, nbWorkers), [timeLimit] * nbWorkers, heuristicStarts(nbWorkers))
+            )
+
+    workers = [stats for _, stats in results]
+    arrays, _ = min(results, key=lambda result: result[1]["cost"])
+    return Solution(instance, *arrays), workers
@@ -0,0 +1,203 @@
+import random as rd
+import time
+
+import numpy as np
+
+import localSearch as ls
+from classes import Solution, construction_costs, operational_costs
+from heuristic import dropHeuristic
+
+# Probability for a station to be opened or closed by a mutation
+mutationRate = 0.05
+# Children improved by local search at each generation, and seconds given to each of them
+nbImproved = 1
+improvementTime = 1.0
+
+
+class Population:
+    # P solutions as stacked compact arrays, scored together
+    turbineStation: np.ndarray # [P, t]
+    stationType: np.ndarray # [P, s]
+    landCable: np.ndarray # [P, s]
+    partner: np.ndarray # [P, s] other end of the substation cable of s, -1 if none
+    subCable: np.ndarray # [P, s] type of the substation cable of s, -1 if none
+    costs: np.ndarray # [P]
+
+    def __init__(self, instance, turbineStation, stationType, landCable, partner, subCable, costs=None) -> None:
+        self.instance = instance
+        self.turbineStation = turbineStation
+        self.stationType = stationType
+        self.landCable = landCable
+        self.partner = partner
+        self.subCable = subCable
+        self.costs = self.evaluate() if costs is None else costs
+
+        return None
+
+    @classmethod
+    def fromSolutions(cls, instance, sols):
+        return cls(instance, *[np.concatenate(arrays) for arrays in zip(*[sol.stacked() for sol in sols])])
+
+    def arrays(self):
+        return self.turbineStation, self.stationType, self.landCable, self.partner, self.subCable
+
+    def __len__(self):
+        return len(self.costs)
+
+    def evaluate(self):
+        return construction_costs(self.instance, *self.arrays()) + operational_costs(self.instance, *self.arrays())
+
+    def solution(self, i):
+        first = np.flatnonzero(self.partner[i] > np.arange(len(self.partner[i])))
+        subCables = {(int(s), int(self.partner[i, s])): int(self.subCable[i, s]) for s in first}
+        return Solution(self.instance, self.turbineStation[i].copy(), self.stationType[i].copy(), self.landCable[i].copy(), subCables)
+
+    def take(self, rows):
+        return Population(self.instance, *[array[rows] for array in self.arrays()], self.costs[rows])
+
+    def set(self, i, sol, cost):
+        self.turbineStation[i], self.stationType[i], self.landCable[i], partner, subCable = [array[0] for array in sol.stacked()]
+        self.partner[i], self.subCable[i] = partner, subCable
+        self.costs[i] = cost
+
+
+######### OPERATORS
+
+
+def crossover(instance, parentsA, parentsB, rng):
+    # Uniform crossover on the stations: each station and its cable come from one parent, turbines keep
+    # the station of one of their parents when it is still open
+    nbChildren, nbStations = parentsA.stationType.shape
+    rows = np.arange(nbChildren)[:, None]
+    fromA = rng.random((nbChildren, nbStations)) < 0.5
+    stationType = np.where(fromA, parentsA.stationType, parentsB.stationType)
+    landCable = np.where(fromA, parentsA.landCable, parentsB.landCable)
+
+    # Substation cables whose two ends come from the same parent
+    keepA = fromA & (parentsA.partner >= 0) & fromA[rows, np.maximum(parentsA.partner, 0)]
+    keepB = ~fromA & (parentsB.partner >= 0) & ~fromA[rows, np.maximum(parentsB.partner, 0)]
+    partner = np.where(keepA, parentsA.partner, np.where(keepB, parentsB.partner, -1))
+    subCable = np.where(keepA, parentsA.subCable, np.where(keepB, parentsB.subCable, -1))
+
+    openStations = stationType >= 0
+    takeA = rng.random(parentsA.turbineStation.shape) < 0.5
+    first = np.where(takeA, parentsA.turbineStation, parentsB.turbineStation)
+    second = np.where(takeA, parentsB.turbineStation, parentsA.turbineStation)
+    turbineStation = np.where(openStations[rows, first], first, np.where(openStations[rows, second], second, -1))
+
+    return repair(instance, turbineStation, stationType, landCable, partner, subCable, parentsA)
+
+
+def mutate(instance, turbineStation, stationType, landCable, partner, subCable, rng, configs):
+    # Open or close random stations, send the turbines to their nearest open station and resize the changed stations
+    flip = rng.random(stationType.shape) < mutationRate
+    opened = flip & (stationType < 0)
+    closed = flip & (stationType >= 0)
+    stationType = np.where(closed, -1, np.where(opened, 0, stationType))
+    landCable = np.where(closed, -1, np.where(opened, 0, landCable))
+    partner = np.where(closed | closed[np.arange(len(partner))[:, None], np.maximum(partner, 0)], -1, partner)
+    subCable = np.where(partner >= 0, subCable, -1)
+    # Turbines go to the nearest open station
+    moved = flip.any(axis=1)
+    turbineStation = np.where(moved[:, None], -1, turbineStation)
+    arrays = repair(instance, turbineStation, stationType, landCable, partner, subCable)
+    return resize(instance, *arrays, moved, configs)
+
+
+def repair(instance, turbineStation, stationType, landCable, partner, subCable, fallback=None):
+    # Solutions with no open station take the ones of fallback, unassigned turbines go to their nearest open station
+    rows = np.arange(len(stationType))[:, None]
+    empty = ~(stationType >= 0).any(axis=1)
+    if empty.any():
+        if fallback is None:
+            raise ValueError("Solution without open station")
+        turbineStation, stationType, landCable, partner, subCable = [
+            np.where(empty[:, None], original, array)
+            for original, array in zip(fallback.arrays(), (turbineStation, stationType, landCable, partner, subCable))
+        ]
+
+    lost = turbineStation < 0
+    if lost.any():
+        # [P, t, k] whether the k-th nearest station of t is open
+        openInOrder = (stationType >= 0)[rows[:, :, None], instance.turbine_station_order[None, :, :]]
+        nearest = np.take_along_axis(
+            np.broadcast_to(instance.turbine_station_order, openInOrder.shape),
+            np.argmax(openInOrder, axis=2)[:, :, None],
+            axis=2,
+        )[:, :, 0]
+        turbineStation = np.where(lost, nearest, turbineStation)
+    return turbineStation, stationType, landCable, partner, subCable
+
+
+def resize(instance, turbineStation, stationType, landCable, partner, subCable, rows, configs):
+    # Cheapest configuration for the load of every open station of the given rows
+    cost, bestType, bestCable = configs
+    nbSolutions, nbStations = stationType.shape
+    nbTurbines = np.bincount(
+        (turbineStation + nbStations * np.arange(nbSolutions)[:, None]).ravel(), minlength=nbSolutions * nbStations
+    ).reshape(nbSolutions, nbStations)
+    stations = np.arange(nbStations)[None, :]
+    change = rows[:, None] & (stationType >= 0)
+    stationType = np.where(change, bestType[stations, nbTurbines], stationType)
+    landCable = np.where(change, bestCable[stations, nbTurbines], landCable)
+    return turbineStation, stationType, landCable, partner, subCable
+
+
+######### MEMETIC SEARCH
+
+
+def improve(instance, population, i, deadline, tracer=None):
+    # Memetic step: local search from the i-th solution
+    sol = population.solution(i)
+    evaluator = ls.newEvaluator(instance, sol)
+    if tracer is not None:
+        tracer.attach(evaluator)
+    ls.runLocalSearch(instance, sol, evaluator, deadline, tracer)
+    population.set(i, sol, evaluator.cost)
+
+
+def runMemetic(instance, popSize=32, timeLimit=10.0, seed=0, tracer=None, startSol=None):
+    # Genetic search on populations scored in one batch, the best children improved by local search;
+    # the first individual is startSol when given, the constructive heuristic otherwise
+    rng = np.random.default_rng(seed)
+    rd.seed(seed)
+    start = time.perf_counter()
+    deadline = start + timeLimit
+    configs = instance.cheapest_station_configs()
+
+    sols = [dropHeuristic(instance) if startSol is None else startSol.copy()] + [ls.getRandomSol(instance) for _ in range(popSize - 1)]
+    population = Population.fromSolutions(instance, sols)
+    arrays = resize(instance, *population.arrays(), np.ones(popSize, dtype=bool), configs)
+    population = Population(instance, *arrays)
+    history = [(time.perf_counter() - start, population.costs.min())]
+
+    while time.perf_counter() < deadline:
+        # Binary tournaments
+        contenders = rng.integers(popSize, size=(2, 2, popSize))
+        winners = np.where(
+            population.costs[contenders[:, 0]] <= population.costs[contenders[:, 1]], contenders[:, 0], contenders[:, 1]
+        )
+        parentsA, parentsB = population.take(winners[0]), population.take(winners[1])
+        arrays = crossover(instance, parentsA, parentsB, rng)
+        children = Population(instance, *mutate(instance, *arrays, rng, configs))
+
+        for i in np.argsort(children.costs)[:nbImproved]:
+            improve(instance, children, i, min(deadline, time.perf_counter() + improvementTime), tracer)
+
+        # Best distinct solutions of parents and children survive
+        merged = Population(
+            instance,
+            *[np.concatenate((old, new)) for old, new in zip(population.arrays(), children.arrays())],
+            np.concatenate((population.costs, children.costs)),
+        )
+        _, distinct = np.unique(np.round(merged.costs, 6), return_index=True)
+        population = merged.take(distinct[:popSize])
+        if len(population) < popSize:
+            population = merged.take(np.argsort(merged.costs)[:popSize])
+        history.append((time.perf_counter() - start, population.costs.min()))
+        if tracer is not None:
+            tracer.count("generations")
+            tracer.recordCost(population.costs.min())
+
+    best = np.argmin(population.costs)
+    return population.solution(best), history
@@ -0,0 +1,102 @@
+import math
+import random as rd
+
+import numpy as np
+
+# Smallest objective decrease counted as an improvement, by the criteria and the local search
+eps = 1e-6
+
+
+class AdaptiveScheduler:
+    # Roulette choice of the neighborhoods, weighted by their recent improvement per millisecond
+    def __init__(self, nbNeighborhoods=7, decay=0.95, minShare=0.1, nbProbes=10) -> None:
+        # decay: weight of the past at each call of a neighborhood, minShare: part of the choices made uniformly,
+        # nbProbes: calls of each neighborhood, in order, before the first weighted choice
+        self.decay = decay
+        self.minShare = minShare
+        self.nbProbes = nbProbes
+        self.gain = np.zeros(nbNeighborhoods)
+        self.time = np.zeros(nbNeighborhoods)
+        self.calls = np.zeros(nbNeighborhoods, dtype=int)
+
+        return None
+
+    def rates(self):
+        return np.where(self.time > 0, self.gain / np.maximum(self.time, 1e-12) / 1000, 0)
+
+    def choose(self):
+        # Every neighborhood is probed first, one after the other
+        untried = np.flatnonzero(self.calls < self.nbProbes)
+        if len(untried) > 0:
+            return int(untried[0])
+        rates = self.rates()
+        if rates.sum() <= 0 or rd.random() < self.minShare:
+            return rd.randrange(len(rates))
+        return int(np.searchsorted(np.cumsum(rates), rd.random() * rates.sum(), side="right"))
+
+    def record(self, voisType, improvement, seconds):
+        # Degradations accepted by the criterion count as no gain
+        self.gain[voisType] = self.decay * self.gain[voisType] + max(improvement, 0)
+        self.time[voisType] = self.decay * self.time[voisType] + seconds
+        self.calls[voisType] += 1
+
+
+class Descent:
+    # Improving moves only
+    def start(self, cost):
+        pass
+
+    def update(self, cost, progress):
+        pass
+
+    def accept(self, delta):
+        return delta < -eps
+
+
+class Annealing:
+    # Metropolis acceptance, the temperature decreasing geometrically with the spent part of the budget
+    def __init__(self, initTemperature=1e-3, finalTemperature=1e-6) -> None:
+        # Temperatures relative to the cost of the starting solution
+        self.initTemperature = initTemperature
+        self.finalTemperature = finalTemperature
+        self.temperature = 0.0
+
+        return None
+
+    def start(self, cost):
+        self.t0 = self.initTemperature * cost
+        self.t1 = self.finalTemperature * cost
+        self.temperature = self.t0
+
+    def update(self, cost, progress):
+        # progress: spent part of the budget, from 0 to 1
+        self.temperature = self.t0 * (self.t1 / self.t0) ** min(progress, 1.0)
+
+    def accept(self, delta):
+        return delta < -eps or self.temperature > 0 and rd.random() < math.exp(-max(delta, 0) / self.temperature)
+
+
+class LateAcceptance:
+    # Late acceptance hill climbing: moves no worse than the current cost, or than the cost length iterations ago
+    def __init__(self, length=100) -> None:
+        self.length = length
+
+        return None
+
+    def start(self, cost):
+        self.history = [cost] * self.length
+        self.current = cost
+        self.iteration = 0
+
+    def update(self, cost, progress):
+        # cost is the one reached by the previous iteration: it fills the slot that iteration compared against,
+        # read again length iterations later
+        self.history[self.iteration % self.length] = cost
+        self.current = cost
+        self.iteration += 1
+
+    def accept(self, delta):
+        return delta <= 0 or self.current + delta <= self.history[self.iteration % self.length]
+
+
+criteria = {"descent": Descent, "annealing": Annealing, "late": LateAcceptance}
@@ -0,0 +1,119 @@
+import numpy as np
+
+
+class NearestOpenStations:
+    # Nearest and second nearest open station of every turbine, kept up to date as stations open and close
+    # Each turbine walks its list of stations sorted by distance, so a change only touches
+    # the turbines whose nearest or second nearest open station actually changes
+    isOpen: np.ndarray # [s] whether s is open
+    position: np.ndarray # [t] rank of the nearest open station of t, nb_stations if none
+    nearest: np.ndarray # [t] nearest open station of t, -1 if none
+    secondPosition: np.ndarray # [t] rank of the second nearest open station of t, nb_stations if none
+    second: np.ndarray # [t] second nearest open station of t, -1 if none
+
+    def __init__(self, instance, openStations) -> None:
+        self.order = instance.turbine_station_order
+        self.rank = instance.turbine_station_rank
+        self.isOpen = np.array(openStations, dtype=bool)
+        nbTurbines = instance.get_nb_turbines()
+        allTurbines = np.arange(nbTurbines)
+        self.position = np.zeros(nbTurbines, dtype=int)
+        self.nearest = np.full(nbTurbines, -1)
+        self.secondPosition = np.zeros(nbTurbines, dtype=int)
+        self.second = np.full(nbTurbines, -1)
+        self._advance(allTurbines)
+        self._advanceSecond(allTurbines)
+
+        return None
+
+    def _walk(self, turbines, position):
+        # Move the turbines forward in their lists, from position, up to the first open station, returns it
+        nbStations = len(self.isOpen)
+        moving = turbines
+        while len(moving) > 0:
+            moving = moving[position[moving] < nbStations]
+            moving = moving[~self.isOpen[self.order[moving, np.minimum(position[moving], nbStations - 1)]]]
+            position[moving] += 1
+        found = position[turbines] < nbStations
+        return np.where(found, self.order[turbines, np.minimum(position[turbines], nbStations - 1)], -1)
+
+    def _advance(self, turbines):
+        self.nearest[turbines] = self._walk(turbines, self.position)
+
+    def _advanceSecond(self, turbines):
+        # The stations before the nearest open one are closed, the second one comes after it
+        self.secondPosition[turbines] = np.minimum(self.position[turbines] + 1, len(self.isOpen))
+        self.second[turbines] = self._walk(turbines, self.secondPosition)
+
+    def gains(self, station):
+        # Turbines whose nearest open station would become station if it opened
+        return np.flatnonzero(self.rank[:, station] < self.position)
+
+    def open(self, station):
+        # Returns the turbines whose nearest open station changed
+        rank = self.rank[:, station]
+        changed = np.flatnonzero(rank < self.position)
+        secondChanged = np.flatnonzero((self.position < rank) & (rank < self.secondPosition))
+        self.isOpen[station] = True
+        self.secondPosition[changed], self.second[changed] = self.position[changed], self.nearest[changed]
+        self.position[changed] = rank[changed]
+        self.nearest[changed] = station
+        self.secondPosition[secondChanged] = rank[secondChanged]
+        self.second[secondChanged] = station
+        return changed
+
+    def close(self, station):
+        # Returns the turbines whose nearest open station changed
+        self.isOpen[station] = False
+        changed = np.flatnonzero(self.nearest == station)
+        secondChanged = np.flatnonzero(self.second == station)
+        # The second nearest becomes the nearest
+        self.position[changed], self.nearest[changed] = self.secondPosition[changed], self.second[changed]
+        self._advanceSecond(np.concatenate((changed, secondChanged)))
+        return changed
+
+    def kNearest(self, turbines, k, exclude=()):
+        # [turbines, k] k nearest open stations of the turbines, ignoring exclude, -1 when there are fewer
+        available = self.isOpen.copy()
+        available[list(exclude)] = False
+        stations = self.order[turbines]
+        # Open stations first, each group in distance order
+        first = np.argsort(~available[stations], axis=1, kind="stable")[:, :k]
+        result = np.take_along_axis(stations, first, axis=1)
+        return np.where(available[result], result, -1)
+
+    def nearestTo(self, turbines, exclude=None):
+        # Nearest open station of the turbines other than exclude
+        result = self.nearest[turbines].copy()
+        if exclude is not None:
+            hit = result == exclude
+            result[hit] = self.second[turbines[hit]]
+        return result
+
+
+class CandidateLists:
+    # Granular neighborhoods: the k nearest sites of each turbine and of each site, and don't-look bits
+    # telling which turbines found no improving relocation since their surroundings last changed
+    turbineCandidates: np.ndarray # [t, k] nearest stations of t
+    stationCandidates: np.ndarray # [s, k] nearest other stations of s
+    inList: np.ndarray # [t, s] whether s is a candidate of t
+    dontLook: np.ndarray # [t]
+
+    def __init__(self, instance, k) -> None:
+        k = min(k, instance.get_nb_stations())
+        self.turbineCandidates = instance.turbine_station_order[:, :k]
+        self.inList = instance.turbine_station_rank < k
+        order = np.argsort(instance.station_station_dist, axis=1, kind="stable")
+        # The station itself comes first, at distance 0
+        self.stationCandidates = order[:, 1 : k + 1]
+        self.dontLook = np.zeros(instance.get_nb_turbines(), dtype=bool)
+
+        return None
+
+    def awake(self):
+        return np.flatnonzero(~self.dontLook)
+
+    def wake(self, stations, turbineStation):
+        # The turbines linked to stations, or having one of them as candidate, may improve again
+        watching = self.inList[:, stations].any(axis=1) | np.isin(turbineStation, stations)
+        self.dontLook &= ~watching